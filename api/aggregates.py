@@ -0,0 +1,123 @@
+"""
+Per-user spending aggregates, maintained as transactions are added
+"""
+import bisect
+import threading
+from datetime import date, timedelta
+
+from indexes import day_ordinal
+
+
+class DailyTotals:
+    def __init__(self):
+        """Amounts per day, with a prefix-sum index for range totals"""
+        self.by_day = {}
+        # Distinct day ordinals in order, with running totals up to each, so any
+        # date range is two bisects and a subtraction
+        self._days = []
+        self._prefix = []
+        self._days_stale = False
+        # Range queries rebuild the index on the read path, which doesn't hold the
+        # storage lock, so adds and rebuilds have to exclude each other here
+        self._lock = threading.Lock()
+
+    def add(self, day: str, amount: float):
+        ordinal = day_ordinal(day)
+        with self._lock:
+            self.by_day[day] = self.by_day.get(day, 0) + amount
+            if self._days_stale or (self._days and ordinal < self._days[-1]):
+                # Back-dated: rebuild the running totals on the next range query
+                self._days_stale = True
+            elif self._days and ordinal == self._days[-1]:
+                self._prefix[-1] += amount
+            else:
+                self._days.append(ordinal)
+                self._prefix.append((self._prefix[-1] if self._prefix else 0) + amount)
+
+    def _refresh_days(self):
+        """Rebuild the index after back-dated adds; called with the lock held"""
+        if not self._days_stale:
+            return
+        by_ordinal = {}
+        for day, amount in self.by_day.items():
+            ordinal = day_ordinal(day)
+            by_ordinal[ordinal] = by_ordinal.get(ordinal, 0) + amount
+        self._days = sorted(by_ordinal)
+        self._prefix = []
+        running = 0
+        for ordinal in self._days:
+            running += by_ordinal[ordinal]
+            self._prefix.append(running)
+        self._days_stale = False
+
+    def between(self, start: date, end: date) -> float:
+        """Total dated start..end inclusive, in O(log days)"""
+        with self._lock:
+            self._refresh_days()
+            lo = bisect.bisect_left(self._days, start.toordinal())
+            hi = bisect.bisect_right(self._days, end.toordinal())
+            if hi <= lo:
+                return 0
+            return self._prefix[hi - 1] - (self._prefix[lo - 1] if lo else 0)
+
+
+class SpendingSummary:
+    def __init__(self):
+        """Running totals for one user's transactions"""
+        self.total = 0.0
+        self.count = 0
+        self.by_category = {}
+        self.daily = DailyTotals()
+        self.by_day = self.daily.by_day
+        # Per-category daily totals, for range queries filtered by category
+        self.daily_by_category = {}
+        # 'YYYY-MM' -> spending, for the monthly trend chart
+        self.by_month = {}
+
+    @classmethod
+    def from_transactions(cls, transactions: list):
+        """Build a summary by folding in every transaction"""
+        summary = cls()
+        for transaction in transactions:
+            summary.add(transaction)
+        return summary
+
+    def add(self, transaction: dict):
+        """Fold one transaction into the totals in O(1)"""
+        self.add_amount(transaction.get('category', 'Other'),
+                        (transaction.get('date') or '')[:10],
+                        transaction.get('amount', 0))
+
+    def add_amount(self, category: str, day: str, amount: float, count: int = 1):
+        """Fold an amount (possibly pre-summed over count transactions) into the totals"""
+        self.total += amount
+        self.count += count
+        self.by_category[category] = self.by_category.get(category, 0) + amount
+        self.by_month[day[:7]] = self.by_month.get(day[:7], 0) + amount
+        self.daily.add(day, amount)
+        if category not in self.daily_by_category:
+            self.daily_by_category[category] = DailyTotals()
+        self.daily_by_category[category].add(day, amount)
+
+    @property
+    def average(self) -> float:
+        return self.total / self.count if self.count else 0
+
+    def top_category(self):
+        """(category, amount) with the highest spending, or (None, 0) without transactions"""
+        if not self.by_category:
+            return None, 0
+        category = max(self.by_category, key=self.by_category.get)
+        return category, self.by_category[category]
+
+    def spent_between(self, start: date, end: date, category: str = None) -> float:
+        """Spending dated start..end inclusive, optionally in one category, in O(log days)"""
+        if category is None:
+            return self.daily.between(start, end)
+        daily = self.daily_by_category.get(category)
+        return daily.between(start, end) if daily else 0
+
+    def spent_in_last_days(self, days: int, today: date = None) -> float:
+        """Spending from the last `days` days including today"""
+        today = today or date.today()
+        return self.spent_between(today - timedelta(days=days - 1), today)
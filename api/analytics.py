@@ -0,0 +1,76 @@
+"""
+Per-user analytics snapshot shared by the AI pages, cached by data version
+"""
+import threading
+from collections import OrderedDict
+
+
+class AnalyticsSnapshot:
+    def __init__(self, user: dict, spending, budgets: dict, goals: list):
+        """Everything the AI pages derive from a user's data, computed once"""
+        self.income = (user or {}).get('income', 0) or 0
+        self.total_spent = spending.total
+        self.transaction_count = spending.count
+        self.avg_transaction = spending.average
+        # Copies, so a cached snapshot never changes under a reader
+        self.category_spending = dict(spending.by_category)
+        self.top_category, self.top_amount = spending.top_category()
+        self.top_percentage = (self.top_amount / self.total_spent * 100) if self.total_spent > 0 else 0
+
+        self.spending_ratio = (self.total_spent / self.income * 100) if self.income > 0 else 0
+        self.savings_rate = ((self.income - self.total_spent) / self.income * 100) if self.income > 0 else 0
+
+        self.budgets = dict(budgets)
+        self.total_budget = sum(budgets.values())
+        self.budget_efficiency = []
+        for category, spent in self.category_spending.items():
+            if category in budgets:
+                budgeted = budgets[category]
+                efficiency = (spent / budgeted * 100) if budgeted > 0 else 0
+                self.budget_efficiency.append({
+                    'category': category,
+                    'spent': spent,
+                    'budgeted': budgeted,
+                    'efficiency': efficiency,
+                    'status': 'over' if spent > budgeted else 'under' if efficiency < 80 else 'good'
+                })
+
+        self.goals = [dict(goal) for goal in goals]
+        self.total_saved = sum(g.get('current_amount', 0) for g in goals)
+        self.total_target = sum(g.get('target_amount', 0) for g in goals)
+        self.overall_progress = (self.total_saved / self.total_target * 100) if self.total_target > 0 else 0
+        self.goal_progress = [
+            (goal, (goal.get('current_amount', 0) / goal.get('target_amount', 1)) * 100)
+            for goal in self.goals
+        ]
+
+
+class AnalyticsCache:
+    def __init__(self, storage, max_users: int = 1024):
+        """LRU of one snapshot per user, valid while the user's data version is unchanged"""
+        self.storage = storage
+        self.max_users = max_users
+        self._snapshots = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str) -> AnalyticsSnapshot:
+        """The user's snapshot, rebuilt only if their data changed since it was cached"""
+        # Read the version first: a change landing mid-build leaves the snapshot
+        # filed under the older version, so the next request rebuilds it
+        version = self.storage.get_data_version(user_id)
+        with self._lock:
+            cached = self._snapshots.get(user_id)
+            if cached and cached[0] == version:
+                self._snapshots.move_to_end(user_id)
+                return cached[1]
+
+        snapshot = AnalyticsSnapshot(self.storage.get_user_by_id(user_id),
+                                     self.storage.get_spending_summary(user_id),
+                                     self.storage.get_user_budgets(user_id),
+                                     self.storage.get_user_goals(user_id))
+        with self._lock:
+            self._snapshots[user_id] = (version, snapshot)
+            self._snapshots.move_to_end(user_id)
+            while len(self._snapshots) > self.max_users:
+                self._snapshots.popitem(last=False)
+        return snapshot
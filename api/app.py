@@ -1,11 +1,18 @@
-from flask import Flask, jsonify, request, render_template, redirect, url_for, flash, session, send_file
+from flask import Flask, jsonify, request, render_template, redirect, url_for, flash, session, Response, make_response, get_flashed_messages
 from datetime import datetime, timedelta
-import json
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
-import csv
 import io
+import json
+import re
+import base64
 import uuid
 import hashlib
+import functools
+import queue
+import sys
+import threading
+import time
 import traceback
 
 app = Flask(__name__)
@@ -13,101 +20,149 @@ app.config['SECRET_KEY'] = 'your-secret-key-here'
 
 # Data storage files - use absolute paths
 current_dir = os.path.dirname(os.path.abspath(__file__))
-USERS_FILE = os.path.join(current_dir, 'users.json')
-TRANSACTIONS_FILE = os.path.join(current_dir, 'transactions.json')
-BUDGETS_FILE = os.path.join(current_dir, 'budgets.json')
-GOALS_FILE = os.path.join(current_dir, 'goals.json')
-
-# Global data storage
-users = {}
-transactions = []
-budgets = {}
-goals = []
-
-# Load data from files
-def load_data():
-    global users, transactions, budgets, goals
-    
-    # Initialize with empty data
-    users = {}
-    transactions = []
-    budgets = {}
-    goals = []
-    
-    # Load users
-    if os.path.exists(USERS_FILE):
-        try:
-            with open(USERS_FILE, 'r', encoding='utf-8') as f:
-                users = json.load(f)
-        except Exception as e:
-            print(f"Error loading users: {e}")
-            users = {}
-    
-    # Load transactions
-    if os.path.exists(TRANSACTIONS_FILE):
-        try:
-            with open(TRANSACTIONS_FILE, 'r', encoding='utf-8') as f:
-                transactions = json.load(f)
-        except Exception as e:
-            print(f"Error loading transactions: {e}")
-            transactions = []
-    
-    # Load budgets
-    if os.path.exists(BUDGETS_FILE):
-        try:
-            with open(BUDGETS_FILE, 'r', encoding='utf-8') as f:
-                budgets = json.load(f)
-        except Exception as e:
-            print(f"Error loading budgets: {e}")
-            budgets = {}
-    
-    # Load goals
-    if os.path.exists(GOALS_FILE):
+
+# Make sibling modules importable whether run directly, via wsgi.py or on Vercel
+sys.path.append(current_dir)
+from storage import get_storage
+from analytics import AnalyticsCache
+from export import stream_export
+from importer import load_rows, plan_import
+from events import EventBroker, CLOSED
+from passwords import hasher_from_env
+from timeseries import TREND_MONTHS, GRANULARITIES, bucket_count, chart_series, spending_buckets
+from sessions import ResolvedUsers, create_session_interface
+from ratelimit import limiter_from_env
+
+# Password hashing - algorithm and work factor come from PASSWORD_HASH / PASSWORD_ITERATIONS / PASSWORD_SCRYPT_N
+passwords = hasher_from_env()
+
+# Hash password
+def hash_password(password):
+    return passwords.hash(password)
+
+# Initialize data - STORAGE_BACKEND selects JSON files (default), SQLite, Supabase or memory
+DATA_DIR = os.environ.get('DATA_DIR', current_dir)
+storage = get_storage(DATA_DIR)
+# One analytics snapshot per user, shared by the AI pages until their data changes
+analytics = AnalyticsCache(storage)
+# Live change notifications for each user's open pages (one process only)
+events = EventBroker()
+
+# Sessions - SESSION_BACKEND keeps them in SQLite (default), memory or the signed cookie
+session_interface = create_session_interface(DATA_DIR)
+if session_interface is not None:
+    app.session_interface = session_interface
+# Each session's user record, re-read from storage after SESSION_USER_TTL seconds
+resolved_users = ResolvedUsers(storage, int(os.environ.get('SESSION_CACHE_SIZE', 10000)),
+                               float(os.environ.get('SESSION_USER_TTL', 10)))
+
+def current_user():
+    """The logged-in user's record, or None"""
+    user_id = session.get('user_id')
+    if not user_id:
+        return None
+    sid = getattr(session, 'sid', None)
+    if sid is None:
+        return storage.get_user_by_id(user_id)
+    return resolved_users.get(sid, user_id)
+
+# Expired password reset tokens are dropped from storage this often (0 turns the sweep off)
+RESET_TOKEN_SWEEP_SECONDS = float(os.environ.get('RESET_TOKEN_SWEEP_SECONDS', 300))
+
+def sweep_reset_tokens():
+    """Background loop dropping expired reset tokens, so the user data doesn't keep them"""
+    while True:
         try:
-            with open(GOALS_FILE, 'r', encoding='utf-8') as f:
-                goals = json.load(f)
+            purged = storage.purge_expired_reset_tokens()
+            if purged:
+                print(f"Dropped {purged} expired password reset token(s)")
         except Exception as e:
-            print(f"Error loading goals: {e}")
-            goals = []
+            print(f"Reset token sweep error: {e}")
+        time.sleep(RESET_TOKEN_SWEEP_SECONDS)
+
+if RESET_TOKEN_SWEEP_SECONDS > 0 and not os.environ.get('VERCEL'):
+    threading.Thread(target=sweep_reset_tokens, name='reset-token-sweep', daemon=True).start()
 
-# Save data to files
-def save_data():
+def notify_change(user_id, kind):
+    """Tell the user's open /api/stream feeds that their data changed"""
+    events.publish(user_id, {'kind': kind, 'version': storage.get_data_version(user_id)})
+
+def _code_version():
+    """Changes when the code or templates are redeployed, so old ETags stop matching"""
+    templates_dir = os.path.join(current_dir, 'templates')
+    paths = [os.path.join(current_dir, name) for name in os.listdir(current_dir) if name.endswith('.py')]
+    paths += [os.path.join(templates_dir, name) for name in os.listdir(templates_dir)]
+    return str(max(os.path.getmtime(path) for path in paths))
+
+CODE_VERSION = _code_version()
+
+# Rate limiting - each client IP and each user gets RATE_LIMIT_CAPACITY tokens, refilled at
+# RATE_LIMIT_REFILL per second; RATE_LIMIT_BACKEND=sqlite shares the buckets between workers
+limiter = limiter_from_env(DATA_DIR)
+# Tokens a request costs (default 1): password hashing and the AI analyses cost more than a page view
+POST_COSTS = {'login': 10, 'register': 10, 'forgot_password': 10, 'reset_password': 10, 'import_transactions': 5}
+ROUTE_COSTS = {'ai_analysis': 5, 'smart_recommendations': 5, 'budget_optimizer': 5, 'goal_insights': 5,
+               'ai_predictions': 5}
+# Endpoints never limited: health checks, static files and the long-lived event stream
+UNLIMITED = {'health_check', 'static', 'api_stream'}
+# Number of reverse proxies in front of the app (1 on Vercel). ProxyFix takes the client's
+# address from that many entries from the right of X-Forwarded-For - the ones our own
+# proxies appended - so a client can't pick its own rate limit bucket by sending the header
+TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 1 if os.environ.get('VERCEL') else 0))
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
+
+@app.before_request
+def rate_limit():
+    """Refuse the request with 429 once the client's or user's bucket is empty"""
+    if limiter is None or request.endpoint in UNLIMITED:
+        return None
+    cost = ROUTE_COSTS.get(request.endpoint, 1)
+    if request.method == 'POST':
+        cost = POST_COSTS.get(request.endpoint, cost)
+    keys = [f"ip:{request.remote_addr or 'unknown'}"]
+    if session.get('user_id'):
+        keys.append(f"user:{session['user_id']}")
     try:
-        # For Vercel deployment, we'll use in-memory storage only
-        # Vercel has a read-only filesystem, so we can't write files
-        if os.environ.get('VERCEL'):
-            print("Running on Vercel - using in-memory storage only")
-            return
-            
-        # Only try to save files if not on Vercel
-        os.makedirs(current_dir, exist_ok=True)
-        
-        # Save users
-        with open(USERS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(users, f, indent=2, ensure_ascii=False)
-        
-        # Save transactions
-        with open(TRANSACTIONS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(transactions, f, indent=2, ensure_ascii=False)
-        
-        # Save budgets
-        with open(BUDGETS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(budgets, f, indent=2, ensure_ascii=False)
-        
-        # Save goals
-        with open(GOALS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(goals, f, indent=2, ensure_ascii=False)
-            
+        retry_after = limiter.check(keys, cost)
     except Exception as e:
-        print(f"Error saving data: {e}")
-        # Continue with in-memory storage
+        # A broken limiter shouldn't take the site down with it
+        print(f"Rate limit error: {e}")
+        return None
+    if retry_after:
+        return jsonify({
+            "error": "Too Many Requests",
+            "message": f"Too many requests. Please try again in {retry_after} seconds.",
+            "retry_after": retry_after
+        }), 429, {'Retry-After': str(retry_after)}
+    return None
 
-# Hash password
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+def user_data_etag(user_id):
+    """ETag for a user's pages: their data version, plus today's date for the date-relative figures"""
+    key = f"{CODE_VERSION}:{datetime.now().date().isoformat()}:{user_id}:{storage.get_data_version(user_id)}"
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
 
-# Initialize data
-load_data()
+def etag_by_user_data(view):
+    """Answer If-None-Match with 304 from the data version, before the view aggregates anything"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        user_id = session.get('user_id')
+        # Pending flash messages get rendered into the page, so it must be rebuilt
+        if not user_id or session.get('_flashes'):
+            return view(*args, **kwargs)
+        
+        etag = user_data_etag(user_id)
+        if request.if_none_match.contains(etag):
+            response = make_response('', 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            # Error pages and pages that showed a flash message are one-offs
+            if response.status_code != 200 or session.get('_flashes') or get_flashed_messages():
+                return response
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return wrapper
 
 # Error handler
 @app.errorhandler(500)
@@ -128,20 +183,17 @@ def not_found_error(error):
 @app.route('/debug')
 def debug_info():
     """Debug endpoint to check app status"""
+    stats = storage.stats()
     return jsonify({
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "users_count": len(users),
-        "transactions_count": len(transactions),
-        "budgets_count": len(budgets),
-        "goals_count": len(goals),
+        "users_count": stats['users'],
+        "transactions_count": stats['transactions'],
+        "budgets_count": stats['budgets'],
+        "goals_count": stats['goals'],
         "current_dir": current_dir,
-        "files_exist": {
-            "users": os.path.exists(USERS_FILE),
-            "transactions": os.path.exists(TRANSACTIONS_FILE),
-            "budgets": os.path.exists(BUDGETS_FILE),
-            "goals": os.path.exists(GOALS_FILE)
-        },
+        "data_dir": DATA_DIR,
+        "storage": stats,
         "vercel": os.environ.get('VERCEL', False),
         "environment": os.environ.get('FLASK_ENV', 'development')
     })
@@ -175,8 +227,8 @@ def test_session():
     try:
         return jsonify({
             "session_data": dict(session),
-            "users_count": len(users),
-            "user_ids": [user.get('id') for user in users.values()],
+            "users_count": storage.stats()['users'],
+            "user_ids": storage.list_user_ids(),
             "status": "success"
         })
     except Exception as e:
@@ -210,20 +262,23 @@ def register():
                 flash('All fields are required!', 'error')
                 return render_template('register.html')
             
-            if username in users:
+            if storage.get_user_by_username(username):
                 flash('Username already exists!', 'error')
                 return render_template('register.html')
             
+            if storage.get_user_by_email(email):
+                flash('Email already registered!', 'error')
+                return render_template('register.html')
+            
             # Create user with hashed password
             user_id = str(uuid.uuid4())
-            users[username] = {
+            storage.save_user({
                 'id': user_id,
                 'email': email,
                 'username': username,
                 'password': hash_password(password),
                 'income': income
-            }
-            save_data()
+            })
             
             flash('Registration successful! Please login.', 'success')
             return redirect(url_for('login'))
@@ -243,33 +298,26 @@ def login():
             email = data.get('email')
             password = data.get('password')
             
-            print(f"Login attempt for email: {email}")
-            print(f"Users available: {list(users.keys())}")
-            
-            # Simple credential check
-            user_found = None
-            for username, user in users.items():
-                print(f"Checking user: {username}")
-                if user.get('email') == email:
-                    print(f"Email match found for: {username}")
-                    if user.get('password') == hash_password(password):
-                        print(f"Password match for: {username}")
-                        user_found = user
-                        break
-                    else:
-                        print(f"Password mismatch for: {username}")
+            # One indexed lookup and one hash per attempt, whether or not the
+            # email exists, and nothing logged per user
+            user = storage.get_user_by_email(email) if email else None
+            if user and user.get('password'):
+                valid = passwords.verify(password, user['password'])
+            else:
+                valid = passwords.reject(password)
             
-            if user_found:
-                print(f"Login successful for: {user_found.get('username')}")
+            if valid:
+                # Upgrade legacy SHA-256 or outdated hashes while the plain password is at hand
+                if passwords.needs_rehash(user['password']):
+                    user['password'] = hash_password(password)
+                    storage.save_user(user)
                 # Set minimal session data
-                session['user_id'] = user_found.get('id')
-                session['username'] = user_found.get('username')
-                print(f"Session data set: {dict(session)}")
+                session['user_id'] = user.get('id')
+                session['username'] = user.get('username')
                 flash('Login successful!', 'success')
                 return redirect(url_for('dashboard'))
-            else:
-                print("No matching user found")
-                flash('Invalid email or password!', 'error')
+            
+            flash('Invalid email or password!', 'error')
         
         return render_template('login.html')
     except Exception as e:
@@ -285,18 +333,14 @@ def forgot_password():
             email = request.form.get('email')
             
             # Find user by email
-            user_found = None
-            for username, user in users.items():
-                if user['email'] == email:
-                    user_found = user
-                    break
+            user_found = storage.get_user_by_email(email)
             
             if user_found:
                 # Generate a simple reset token (in production, use proper tokens)
                 reset_token = str(uuid.uuid4())
                 user_found['reset_token'] = reset_token
                 user_found['reset_expires'] = (datetime.now() + timedelta(hours=1)).isoformat()
-                save_data()
+                storage.save_user(user_found)
                 
                 flash(f'Password reset link sent to {email}. Check your email.', 'success')
                 return redirect(url_for('reset_password', token=reset_token))
@@ -315,17 +359,19 @@ def reset_password(token):
     try:
         # Find user with this token
         user_found = None
-        for username, user in users.items():
-            if user.get('reset_token') == token:
-                # Check if token is expired
-                if 'reset_expires' in user:
-                    expires = datetime.fromisoformat(user['reset_expires'])
-                    if datetime.now() < expires:
-                        user_found = user
-                    else:
-                        flash('Reset link has expired. Please request a new one.', 'error')
-                        return redirect(url_for('forgot_password'))
-                break
+        user = storage.get_user_by_reset_token(token)
+        if user:
+            # Check if token is expired
+            if 'reset_expires' in user:
+                expires = datetime.fromisoformat(user['reset_expires'])
+                if datetime.now() < expires:
+                    user_found = user
+                else:
+                    user.pop('reset_token', None)
+                    user.pop('reset_expires', None)
+                    storage.save_user(user)
+                    flash('Reset link has expired. Please request a new one.', 'error')
+                    return redirect(url_for('forgot_password'))
         
         if not user_found:
             flash('Invalid or expired reset link.', 'error')
@@ -351,7 +397,7 @@ def reset_password(token):
             user_found['password'] = hash_password(new_password)
             user_found.pop('reset_token', None)
             user_found.pop('reset_expires', None)
-            save_data()
+            storage.save_user(user_found)
             
             flash('Password reset successful! You can now login with your new password.', 'success')
             return redirect(url_for('login'))
@@ -363,7 +409,20 @@ def reset_password(token):
         flash('An error occurred. Please try again.', 'error')
         return redirect(url_for('forgot_password'))
 
+# Recent transactions shown on the dashboard
+DASHBOARD_RECENT = 5
+
+def dashboard_totals(user_data, spending, budgets):
+    """Figures on the dashboard's stat cards"""
+    return {
+        'income': user_data.get('income', 0),
+        'total_spent': spending.total,
+        'total_budget': sum(budgets.values()),
+        'weekly_spending': spending.spent_in_last_days(7)
+    }
+
 @app.route('/dashboard')
+@etag_by_user_data
 def dashboard():
     try:
         print(f"Dashboard access - session: {dict(session)}")
@@ -376,11 +435,7 @@ def dashboard():
         print(f"User ID from session: {user_id}")
         
         # Find user data
-        user_data = None
-        for username, user in users.items():
-            if user.get('id') == user_id:
-                user_data = user
-                break
+        user_data = current_user()
         
         if not user_data:
             print(f"User not found for ID: {user_id}")
@@ -390,34 +445,26 @@ def dashboard():
         
         print(f"User data found: {user_data.get('username')}")
         
-        user_transactions = [t for t in transactions if t.get('user_id') == user_id]
-        user_budgets = budgets.get(user_id, {})
-        user_goals = [g for g in goals if g.get('user_id') == user_id]
-        
-        # Calculate basic stats
-        total_spent = sum(t.get('amount', 0) for t in user_transactions)
-        total_budget = sum(user_budgets.values())
-        
-        # Calculate weekly spending (last 7 days)
-        from datetime import datetime, timedelta
-        week_ago = datetime.now() - timedelta(days=7)
-        weekly_transactions = [t for t in user_transactions if datetime.fromisoformat(t.get('date', '2023-01-01')) >= week_ago]
-        weekly_spending = sum(t.get('amount', 0) for t in weekly_transactions)
-        
-        # Get user income
-        income = user_data.get('income', 0)
+        # Read before aggregating, so the page's polling never skips a change made meanwhile
+        version = storage.get_data_version(user_id)
+        recent_transactions, _ = storage.get_transactions_page(user_id, DASHBOARD_RECENT)
+        user_budgets = storage.get_user_budgets(user_id)
+        user_goals = storage.get_user_goals(user_id)
+        spending = storage.get_spending_summary(user_id)
+        totals = dashboard_totals(user_data, spending, user_budgets)
         
-        print(f"Dashboard data - transactions: {len(user_transactions)}, budgets: {len(user_budgets)}, goals: {len(user_goals)}")
-        print(f"Stats - income: {income}, total_spent: {total_spent}, weekly_spending: {weekly_spending}")
+        print(f"Dashboard data - transactions: {spending.count}, budgets: {len(user_budgets)}, goals: {len(user_goals)}")
+        print(f"Stats - income: {totals['income']}, total_spent: {totals['total_spent']}, weekly_spending: {totals['weekly_spending']}")
         
         return render_template('dashboard.html', 
-                             transactions=user_transactions[-5:],
+                             transactions=recent_transactions[::-1],
                              budgets=user_budgets,
                              goals=user_goals,
-                             total_spent=total_spent,
-                             total_budget=total_budget,
-                             income=income,
-                             weekly_spending=weekly_spending)
+                             data_version=version,
+                             event_stream=EVENT_STREAM,
+                             latest=encode_cursor(transaction_position(recent_transactions)),
+                             charts=chart_series(spending, totals['income']),
+                             **totals)
     except Exception as e:
         print(f"Dashboard error: {e}")
         print(traceback.format_exc())
@@ -456,8 +503,8 @@ def add_transaction():
                 'category': category,
                 'date': date
             }
-            transactions.append(transaction)
-            save_data()
+            storage.add_transaction(transaction)
+            notify_change(session['user_id'], 'transaction')
             
             flash('Transaction added successfully!', 'success')
             return redirect(url_for('dashboard'))
@@ -485,8 +532,8 @@ def set_budget():
                     category = key.replace('budget_', '')
                     budget_data[category] = float(value)
             
-            budgets[user_id] = budget_data
-            save_data()
+            storage.set_user_budgets(user_id, budget_data)
+            notify_change(user_id, 'budget')
             flash('Budget set successfully!', 'success')
             return redirect(url_for('dashboard'))
         
@@ -498,62 +545,54 @@ def set_budget():
         return render_template('set_budget.html')
 
 @app.route('/spending_analysis')
+@etag_by_user_data
 def spending_analysis():
     try:
         if 'user_id' not in session:
             return redirect(url_for('login'))
         
         user_id = session['user_id']
-        user_transactions = [t for t in transactions if t.get('user_id') == user_id]
+        recent_transactions, _ = storage.get_transactions_page(user_id, 10)
         
-        # Calculate spending by category
-        category_spending = {}
-        for transaction in user_transactions:
-            category = transaction['category']
-            amount = transaction['amount']
-            category_spending[category] = category_spending.get(category, 0) + amount
+        # Spending by category
+        spending = storage.get_spending_summary(user_id)
         
         return render_template('spending_analysis.html', 
-                             category_spending=category_spending,
-                             transactions=user_transactions)
+                             category_spending=spending.by_category,
+                             transactions=recent_transactions[::-1],
+                             transaction_count=spending.count)
     except Exception as e:
         print(f"Spending analysis error: {e}")
         print(traceback.format_exc())
         flash('An error occurred loading spending analysis. Please try again.', 'error')
         return render_template('spending_analysis.html', 
                              category_spending={},
-                             transactions=[])
+                             transactions=[],
+                             transaction_count=0)
 
 @app.route('/ml_recommendations')
+@etag_by_user_data
 def ml_recommendations():
     try:
         if 'user_id' not in session:
             return redirect(url_for('login'))
         
         user_id = session['user_id']
-        user_transactions = [t for t in transactions if t.get('user_id') == user_id]
-        user_budgets = budgets.get(user_id, {})
+        spending = storage.get_spending_summary(user_id)
+        user_budgets = storage.get_user_budgets(user_id)
         
         # Get user data for income
-        user_data = None
-        for username, user in users.items():
-            if user.get('id') == user_id:
-                user_data = user
-                break
+        user_data = current_user()
         
         income = user_data.get('income', 0) if user_data else 0
-        total_spent = sum(t.get('amount', 0) for t in user_transactions)
+        total_spent = spending.total
         
         # Simple recommendations
         recommendations = []
         
         if total_spent > 0:
             # Top spending category
-            category_spending = {}
-            for transaction in user_transactions:
-                category = transaction.get('category', 'Other')
-                amount = transaction.get('amount', 0)
-                category_spending[category] = category_spending.get(category, 0) + amount
+            category_spending = spending.by_category
             
             if category_spending:
                 top_category = max(category_spending, key=category_spending.get)
@@ -580,13 +619,14 @@ def ml_recommendations():
                              total_spent=0)
 
 @app.route('/goals')
+@etag_by_user_data
 def goals_page():
     try:
         if 'user_id' not in session:
             return redirect(url_for('login'))
         
         user_id = session['user_id']
-        user_goals = [g for g in goals if g.get('user_id') == user_id]
+        user_goals = storage.get_user_goals(user_id)
         
         return render_template('goals.html', goals=user_goals)
     except Exception as e:
@@ -620,8 +660,8 @@ def add_goal():
             'deadline': deadline,
             'category': category
         }
-        goals.append(goal)
-        save_data()
+        storage.add_goal(goal)
+        notify_change(session['user_id'], 'goal')
         
         flash('Goal added successfully!', 'success')
         return redirect(url_for('goals_page'))
@@ -641,12 +681,8 @@ def update_goal_progress():
         goal_id = data.get('goal_id')
         current_amount = float(data.get('current_amount', 0))
         
-        for goal in goals:
-            if goal['id'] == goal_id:
-                goal['current_amount'] = current_amount
-                break
-        
-        save_data()
+        if storage.update_goal_progress(session['user_id'], goal_id, current_amount) is not None:
+            notify_change(session['user_id'], 'goal')
         flash('Goal progress updated!', 'success')
         return redirect(url_for('goals_page'))
     except Exception as e:
@@ -656,33 +692,40 @@ def update_goal_progress():
         return redirect(url_for('goals_page'))
 
 @app.route('/export_data')
+@etag_by_user_data
 def export_data():
     try:
         if 'user_id' not in session:
             return redirect(url_for('login'))
         
         user_id = session['user_id']
-        user_transactions = [t for t in transactions if t.get('user_id') == user_id]
-        
-        # Create CSV
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(['Date', 'Description', 'Amount', 'Category'])
-        
-        for transaction in user_transactions:
-            writer.writerow([
-                transaction['date'],
-                transaction['description'],
-                transaction['amount'],
-                transaction['category']
-            ])
-        
-        output.seek(0)
-        return send_file(
-            io.BytesIO(output.getvalue().encode('utf-8')),
-            mimetype='text/csv',
-            as_attachment=True,
-            download_name=f'transactions_{datetime.now().strftime("%Y%m%d")}.csv'
+        start = request.args.get('from') or None
+        end = request.args.get('to') or None
+        category = request.args.get('category') or None
+        fmt = request.args.get('format', 'csv')
+        include = set(filter(None, request.args.get('include', '').split(',')))
+        try:
+            for value in (start, end):
+                if value:
+                    datetime.strptime(value, '%Y-%m-%d')
+        except ValueError:
+            flash('Export dates must be in YYYY-MM-DD format.', 'error')
+            return redirect(url_for('dashboard'))
+        if fmt not in ('csv', 'jsonl'):
+            flash('Export format must be csv or jsonl.', 'error')
+            return redirect(url_for('dashboard'))
+        
+        # Rows are written as they are read from the date-sorted index
+        chunks = stream_export(
+            storage.iter_user_transactions(user_id, start, end, category),
+            fmt,
+            budgets=storage.get_user_budgets(user_id) if 'budgets' in include else None,
+            goals=storage.get_user_goals(user_id) if 'goals' in include else None)
+        filename = f'transactions_{datetime.now().strftime("%Y%m%d")}.{fmt}'
+        return Response(
+            chunks,
+            mimetype='application/x-ndjson' if fmt == 'jsonl' else 'text/csv',
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
         )
     except Exception as e:
         print(f"Export data error: {e}")
@@ -690,8 +733,48 @@ def export_data():
         flash('An error occurred exporting data. Please try again.', 'error')
         return redirect(url_for('dashboard'))
 
+@app.route('/import', methods=['POST'])
+def import_transactions():
+    """Bulk-add transactions from a CSV (export_data layout) or JSON array upload"""
+    if 'user_id' not in session:
+        return jsonify({"error": "Not logged in"}), 401
+    
+    upload = request.files.get('file')
+    if upload is not None:
+        stream = upload.stream
+        name = (upload.filename or '').lower()
+        content_type = upload.mimetype or ''
+    else:
+        stream = io.BytesIO(request.get_data())
+        name = ''
+        content_type = request.mimetype or ''
+    fmt = request.args.get('format') or ('json' if name.endswith('.json') or 'json' in content_type else 'csv')
+    
+    try:
+        new, duplicates, errors, error_count = plan_import(storage, session['user_id'], load_rows(stream, fmt))
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({"error": f"Could not read {fmt.upper()} upload: {e}"}), 400
+    
+    try:
+        # Every accepted row is persisted with one write
+        storage.add_transactions(new)
+        if new:
+            notify_change(session['user_id'], 'transaction')
+    except Exception as e:
+        print(f"Import error: {e}")
+        print(traceback.format_exc())
+        return jsonify({"error": "Could not save the imported transactions"}), 500
+    
+    return jsonify({
+        "imported": len(new),
+        "duplicates": duplicates,
+        "failed": error_count,
+        "errors": errors
+    })
+
 @app.route('/logout')
 def logout():
+    resolved_users.discard(getattr(session, 'sid', None))
     session.clear()
     flash('Logged out successfully!', 'success')
     return redirect(url_for('index'))
@@ -708,10 +791,231 @@ def api_index():
             "spending_analysis": "/spending_analysis",
             "ml_recommendations": "/ml_recommendations",
             "goals": "/goals",
-            "export_data": "/export_data"
+            "export_data": "/export_data",
+            "transactions": "/api/transactions",
+            "dashboard_updates": "/api/dashboard",
+            "charts": "/api/charts",
+            "spending": "/api/spending",
+            "stream": "/api/stream",
+            "import": "/import"
         }
     })
 
+# Page size bounds for /api/transactions
+TRANSACTIONS_PAGE_SIZE = 50
+TRANSACTIONS_PAGE_SIZE_MAX = 200
+
+def encode_cursor(cursor):
+    """Opaque page cursor for a (date, id) position"""
+    if cursor is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(list(cursor)).encode()).decode()
+
+# Cursors come back from the client, so only ISO dates and plain ids are accepted -
+# the Supabase backend puts them into a filter expression
+CURSOR_DATE = re.compile(r'(\d{4}-\d{2}-\d{2}([T ][0-9:.]+(Z|[+-]\d{2}:?\d{2})?)?)?')
+CURSOR_ID = re.compile(r'[A-Za-z0-9_.:-]+')
+
+def decode_cursor(token):
+    """(date, id) from a page cursor; raises ValueError on a malformed one"""
+    try:
+        date_key, transaction_id = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except Exception:
+        raise ValueError('invalid cursor') from None
+    if not (isinstance(date_key, str) and isinstance(transaction_id, str)
+            and CURSOR_DATE.fullmatch(date_key) and CURSOR_ID.fullmatch(transaction_id)):
+        raise ValueError('invalid cursor')
+    return date_key, transaction_id
+
+@app.route('/api/transactions')
+@etag_by_user_data
+def api_transactions():
+    """Page through the user's transactions, newest first"""
+    if 'user_id' not in session:
+        return jsonify({"error": "Not logged in"}), 401
+    
+    try:
+        limit = int(request.args.get('limit', TRANSACTIONS_PAGE_SIZE))
+        if not 1 <= limit <= TRANSACTIONS_PAGE_SIZE_MAX:
+            raise ValueError(f'limit must be between 1 and {TRANSACTIONS_PAGE_SIZE_MAX}')
+        cursor = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        start = request.args.get('from') or None
+        end = request.args.get('to') or None
+        for value in (start, end):
+            if value:
+                datetime.strptime(value, '%Y-%m-%d')
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        transactions, next_cursor = storage.get_transactions_page(
+            session['user_id'], limit, cursor,
+            category=request.args.get('category') or None, start=start, end=end)
+        return jsonify({
+            "transactions": list(transactions),
+            "next_cursor": encode_cursor(next_cursor)
+        })
+    except Exception as e:
+        print(f"Transactions API error: {e}")
+        return jsonify({"error": "Could not load transactions"}), 500
+
+def transaction_position(transactions):
+    """(date, id) of the first of a newest-first list of transactions, or None"""
+    if not transactions:
+        return None
+    return str(transactions[0].get('date', '')), str(transactions[0].get('id') or '')
+
+@app.route('/api/dashboard')
+def api_dashboard():
+    """What changed on the dashboard since the client's data version
+    
+    An unchanged version is answered without reading any data. Otherwise the
+    stat card totals and chart series come back, with only the recent
+    transactions newer than the client's `after` position.
+    """
+    if 'user_id' not in session:
+        return jsonify({"error": "Not logged in"}), 401
+    
+    user_id = session['user_id']
+    version = storage.get_data_version(user_id)
+    if request.args.get('since') == version:
+        return jsonify({"version": version, "changed": False})
+    
+    try:
+        after = decode_cursor(request.args['after']) if request.args.get('after') else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        user_data = current_user()
+        if not user_data:
+            return jsonify({"error": "Not logged in"}), 401
+        spending = storage.get_spending_summary(user_id)
+        recent, _ = storage.get_transactions_page(user_id, DASHBOARD_RECENT)
+        new = [t for t in recent if after is None or transaction_position([t]) > after]
+        totals = dashboard_totals(user_data, spending, storage.get_user_budgets(user_id))
+        return jsonify({
+            "version": version,
+            "changed": True,
+            "totals": totals,
+            "transactions": new,
+            "latest": encode_cursor(transaction_position(recent)),
+            "charts": chart_series(spending, totals['income'])
+        })
+    except Exception as e:
+        print(f"Dashboard API error: {e}")
+        return jsonify({"error": "Could not load dashboard"}), 500
+
+@app.route('/api/charts')
+@etag_by_user_data
+def api_charts():
+    """Dashboard chart series: spending by category and monthly income vs expenses"""
+    if 'user_id' not in session:
+        return jsonify({"error": "Not logged in"}), 401
+    
+    try:
+        months = int(request.args.get('months', TREND_MONTHS))
+        if not 1 <= months <= 60:
+            raise ValueError('months must be between 1 and 60')
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        user_id = session['user_id']
+        user_data = current_user() or {}
+        return jsonify(chart_series(storage.get_spending_summary(user_id), user_data.get('income', 0), months))
+    except Exception as e:
+        print(f"Charts API error: {e}")
+        return jsonify({"error": "Could not load charts"}), 500
+
+# Bounds for /api/spending: the default range, and the most buckets one query may ask for
+SPENDING_DEFAULT_DAYS = 30
+SPENDING_MAX_BUCKETS = 1000
+
+@app.route('/api/spending')
+@etag_by_user_data
+def api_spending():
+    """Spending summed per day, week or month over a date range, optionally for one category"""
+    if 'user_id' not in session:
+        return jsonify({"error": "Not logged in"}), 401
+    
+    try:
+        end = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') else datetime.now().date()
+        if request.args.get('from'):
+            start = datetime.strptime(request.args['from'], '%Y-%m-%d').date()
+        else:
+            start = end - timedelta(days=SPENDING_DEFAULT_DAYS - 1)
+        granularity = request.args.get('granularity', 'day')
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+        if start > end:
+            raise ValueError('from must not be after to')
+        if bucket_count(start, end, granularity) > SPENDING_MAX_BUCKETS:
+            raise ValueError(f'at most {SPENDING_MAX_BUCKETS} buckets per query; use a wider granularity')
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        category = request.args.get('category') or None
+        spending = storage.get_spending_summary(session['user_id'])
+        return jsonify({
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "granularity": granularity,
+            "category": category,
+            "total": round(spending.spent_between(start, end, category), 2),
+            "buckets": spending_buckets(spending, start, end, granularity, category)
+        })
+    except Exception as e:
+        print(f"Spending API error: {e}")
+        return jsonify({"error": "Could not load spending"}), 500
+
+# Live change stream for open dashboards (off on Vercel, where a stream would hold a
+# serverless invocation and no other instance's changes reach it). Each open stream
+# holds one request thread, so a sync worker is busy for up to STREAM_MAX_SECONDS
+EVENT_STREAM = os.environ.get('EVENT_STREAM', '0' if os.environ.get('VERCEL') else '1') == '1'
+# Comment line sent on a quiet stream so proxies keep the connection open
+STREAM_KEEPALIVE_SECONDS = 15
+# Streams end after this long and the browser reconnects, so no server thread is held forever
+STREAM_MAX_SECONDS = 300
+
+def server_sent_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/stream')
+def api_stream():
+    """Server-sent events: a `change` event whenever the user's data changes through this worker"""
+    if 'user_id' not in session:
+        return jsonify({"error": "Not logged in"}), 401
+    # 204 tells EventSource to stop reconnecting; the dashboard keeps polling
+    if not EVENT_STREAM:
+        return '', 204
+    
+    user_id = session['user_id']
+    # Subscribe before reading the version, so no change can fall in between
+    subscription = events.subscribe(user_id)
+    version = storage.get_data_version(user_id)
+    
+    def generate():
+        yield "retry: 5000\n"
+        yield server_sent_event('version', {'version': version})
+        deadline = datetime.now() + timedelta(seconds=STREAM_MAX_SECONDS)
+        while datetime.now() < deadline:
+            try:
+                event = subscription.get(timeout=STREAM_KEEPALIVE_SECONDS)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            if event is CLOSED:
+                return
+            yield server_sent_event('change', event)
+    
+    response = Response(generate(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Runs when the client disconnects or the stream ends, started or not
+    response.call_on_close(subscription.close)
+    return response
+
 @app.route('/health')
 def health_check():
     return jsonify({
@@ -743,45 +1047,32 @@ def dashboard_simple():
         }), 500
 
 @app.route('/ai-analysis')
+@etag_by_user_data
 def ai_analysis():
     try:
         if 'user_id' not in session:
             return redirect(url_for('login'))
         
-        user_id = session['user_id']
-        user_transactions = [t for t in transactions if t.get('user_id') == user_id]
-        
-        # Get user data for income
-        user_data = None
-        for username, user in users.items():
-            if user.get('id') == user_id:
-                user_data = user
-                break
-        
-        income = user_data.get('income', 0) if user_data else 0
-        total_spent = sum(t.get('amount', 0) for t in user_transactions)
+        snapshot = analytics.get(session['user_id'])
+        income = snapshot.income
+        total_spent = snapshot.total_spent
         
         # AI Analysis
         analysis = {
-            'total_transactions': len(user_transactions),
-            'avg_transaction': total_spent / len(user_transactions) if user_transactions else 0,
-            'spending_ratio': (total_spent / income * 100) if income > 0 else 0,
-            'savings_rate': ((income - total_spent) / income * 100) if income > 0 else 0
+            'total_transactions': snapshot.transaction_count,
+            'avg_transaction': snapshot.avg_transaction,
+            'spending_ratio': snapshot.spending_ratio,
+            'savings_rate': snapshot.savings_rate
         }
         
         # Category analysis
-        category_spending = {}
-        for transaction in user_transactions:
-            category = transaction.get('category', 'Other')
-            amount = transaction.get('amount', 0)
-            category_spending[category] = category_spending.get(category, 0) + amount
+        category_spending = snapshot.category_spending
         
         # Spending insights
         insights = []
         if category_spending:
-            top_category = max(category_spending, key=category_spending.get)
-            top_amount = category_spending[top_category]
-            percentage = (top_amount / total_spent) * 100 if total_spent > 0 else 0
+            top_category = snapshot.top_category
+            percentage = snapshot.top_percentage
             
             insights.append({
                 'type': 'spending_pattern',
@@ -823,41 +1114,26 @@ def ai_analysis():
                              total_spent=0)
 
 @app.route('/smart-recommendations')
+@etag_by_user_data
 def smart_recommendations():
     try:
         if 'user_id' not in session:
             return redirect(url_for('login'))
         
-        user_id = session['user_id']
-        user_transactions = [t for t in transactions if t.get('user_id') == user_id]
-        user_budgets = budgets.get(user_id, {})
-        
-        # Get user data for income
-        user_data = None
-        for username, user in users.items():
-            if user.get('id') == user_id:
-                user_data = user
-                break
-        
-        income = user_data.get('income', 0) if user_data else 0
-        total_spent = sum(t.get('amount', 0) for t in user_transactions)
+        snapshot = analytics.get(session['user_id'])
+        user_budgets = snapshot.budgets
+        income = snapshot.income
+        total_spent = snapshot.total_spent
         
         # Smart recommendations
         recommendations = []
         
         # Spending pattern analysis
-        if user_transactions:
+        if snapshot.transaction_count:
             # Category analysis
-            category_spending = {}
-            for transaction in user_transactions:
-                category = transaction.get('category', 'Other')
-                amount = transaction.get('amount', 0)
-                category_spending[category] = category_spending.get(category, 0) + amount
-            
-            if category_spending:
-                top_category = max(category_spending, key=category_spending.get)
-                top_amount = category_spending[top_category]
-                percentage = (top_amount / total_spent) * 100 if total_spent > 0 else 0
+            if snapshot.category_spending:
+                top_category = snapshot.top_category
+                percentage = snapshot.top_percentage
                 
                 if percentage > 40:
                     recommendations.append({
@@ -869,7 +1145,7 @@ def smart_recommendations():
         
         # Budget recommendations
         if user_budgets:
-            total_budget = sum(user_budgets.values())
+            total_budget = snapshot.total_budget
             if total_budget > income:
                 recommendations.append({
                     'type': 'danger',
@@ -887,7 +1163,7 @@ def smart_recommendations():
         
         # Savings recommendations
         if income > 0:
-            savings_rate = ((income - total_spent) / income) * 100
+            savings_rate = snapshot.savings_rate
             if savings_rate < 10:
                 recommendations.append({
                     'type': 'warning',
@@ -935,39 +1211,26 @@ def smart_recommendations():
                              total_spent=0)
 
 @app.route('/budget-optimizer')
+@etag_by_user_data
 def budget_optimizer():
     try:
         if 'user_id' not in session:
             return redirect(url_for('login'))
         
-        user_id = session['user_id']
-        user_transactions = [t for t in transactions if t.get('user_id') == user_id]
-        user_budgets = budgets.get(user_id, {})
-        
-        # Get user data for income
-        user_data = None
-        for username, user in users.items():
-            if user.get('id') == user_id:
-                user_data = user
-                break
-        
-        income = user_data.get('income', 0) if user_data else 0
-        total_spent = sum(t.get('amount', 0) for t in user_transactions)
+        snapshot = analytics.get(session['user_id'])
+        income = snapshot.income
+        total_spent = snapshot.total_spent
         
         # Budget optimization
         optimization = {
-            'current_budget': sum(user_budgets.values()),
+            'current_budget': snapshot.total_budget,
             'income': income,
             'spending': total_spent,
             'available_for_budget': income - total_spent
         }
         
         # Category spending analysis
-        category_spending = {}
-        for transaction in user_transactions:
-            category = transaction.get('category', 'Other')
-            amount = transaction.get('amount', 0)
-            category_spending[category] = category_spending.get(category, 0) + amount
+        category_spending = snapshot.category_spending
         
         # Budget suggestions
         suggestions = []
@@ -986,18 +1249,7 @@ def budget_optimizer():
             })
         
         # Current vs suggested
-        current_vs_suggested = []
-        for category, spent in category_spending.items():
-            if category in user_budgets:
-                budgeted = user_budgets[category]
-                efficiency = (spent / budgeted * 100) if budgeted > 0 else 0
-                current_vs_suggested.append({
-                    'category': category,
-                    'spent': spent,
-                    'budgeted': budgeted,
-                    'efficiency': efficiency,
-                    'status': 'over' if spent > budgeted else 'under' if efficiency < 80 else 'good'
-                })
+        current_vs_suggested = snapshot.budget_efficiency
         
         return render_template('budget_optimizer.html', 
                              optimization=optimization,
@@ -1015,23 +1267,23 @@ def budget_optimizer():
                              category_spending={})
 
 @app.route('/goal-insights')
+@etag_by_user_data
 def goal_insights():
     try:
         if 'user_id' not in session:
             return redirect(url_for('login'))
         
-        user_id = session['user_id']
-        user_goals = [g for g in goals if g.get('user_id') == user_id]
-        user_transactions = [t for t in transactions if t.get('user_id') == user_id]
+        snapshot = analytics.get(session['user_id'])
+        user_goals = snapshot.goals
         
         # Goal insights
         insights = []
-        total_saved = sum(g.get('current_amount', 0) for g in user_goals)
-        total_target = sum(g.get('target_amount', 0) for g in user_goals)
+        total_saved = snapshot.total_saved
+        total_target = snapshot.total_target
         
         if user_goals:
             # Progress analysis
-            overall_progress = (total_saved / total_target * 100) if total_target > 0 else 0
+            overall_progress = snapshot.overall_progress
             insights.append({
                 'type': 'progress',
                 'title': 'Overall Goal Progress',
@@ -1040,8 +1292,7 @@ def goal_insights():
             })
             
             # Goal recommendations
-            for goal in user_goals:
-                progress = (goal.get('current_amount', 0) / goal.get('target_amount', 1)) * 100
+            for goal, progress in snapshot.goal_progress:
                 if progress < 25:
                     insights.append({
                         'type': 'warning',
@@ -1058,18 +1309,12 @@ def goal_insights():
                     })
         
         # Savings rate analysis
-        if user_transactions:
-            total_spent = sum(t.get('amount', 0) for t in user_transactions)
-            # Get user income
-            user_data = None
-            for username, user in users.items():
-                if user.get('id') == user_id:
-                    user_data = user
-                    break
-            income = user_data.get('income', 0) if user_data else 0
+        if snapshot.transaction_count:
+            total_spent = snapshot.total_spent
+            income = snapshot.income
             
             if income > 0:
-                savings_rate = ((income - total_spent) / income) * 100
+                savings_rate = snapshot.savings_rate
                 insights.append({
                     'type': 'info',
                     'title': 'Current Savings Rate',
@@ -1093,30 +1338,22 @@ def goal_insights():
                              total_target=0)
 
 @app.route('/ai-predictions')
+@etag_by_user_data
 def ai_predictions():
     try:
         if 'user_id' not in session:
             return redirect(url_for('login'))
         
-        user_id = session['user_id']
-        user_transactions = [t for t in transactions if t.get('user_id') == user_id]
-        
-        # Get user data for income
-        user_data = None
-        for username, user in users.items():
-            if user.get('id') == user_id:
-                user_data = user
-                break
-        
-        income = user_data.get('income', 0) if user_data else 0
-        total_spent = sum(t.get('amount', 0) for t in user_transactions)
+        snapshot = analytics.get(session['user_id'])
+        income = snapshot.income
+        total_spent = snapshot.total_spent
         
         # Simple predictions based on current data
         predictions = []
         
-        if user_transactions:
+        if snapshot.transaction_count:
             # Monthly spending prediction
-            avg_monthly_spending = total_spent / len(user_transactions) * 30 if user_transactions else 0
+            avg_monthly_spending = snapshot.avg_transaction * 30
             predictions.append({
                 'type': 'spending',
                 'title': 'Monthly Spending Prediction',
@@ -1126,7 +1363,7 @@ def ai_predictions():
             
             # Savings prediction
             if income > 0:
-                current_savings_rate = ((income - total_spent) / income) * 100
+                current_savings_rate = snapshot.savings_rate
                 monthly_savings = income - avg_monthly_spending
                 predictions.append({
                     'type': 'savings',
@@ -1136,16 +1373,9 @@ def ai_predictions():
                 })
             
             # Category predictions
-            category_spending = {}
-            for transaction in user_transactions:
-                category = transaction.get('category', 'Other')
-                amount = transaction.get('amount', 0)
-                category_spending[category] = category_spending.get(category, 0) + amount
-            
-            if category_spending:
-                top_category = max(category_spending, key=category_spending.get)
-                top_amount = category_spending[top_category]
-                monthly_top_category = top_amount / len(user_transactions) * 30
+            if snapshot.category_spending:
+                top_category = snapshot.top_category
+                monthly_top_category = snapshot.top_amount / snapshot.transaction_count * 30
                 predictions.append({
                     'type': 'category',
                     'title': f'Monthly {top_category} Spending',
@@ -1155,7 +1385,7 @@ def ai_predictions():
         
         # Financial health predictions
         if income > 0:
-            savings_rate = ((income - total_spent) / income) * 100
+            savings_rate = snapshot.savings_rate
             if savings_rate > 20:
                 predictions.append({
                     'type': 'success',
@@ -0,0 +1,158 @@
+"""
+Columnar, array-backed in-memory transaction store
+
+Each user's transactions live in parallel columns kept in date order:
+amounts in array('d'), dates as day ordinals in array('i') and categories
+as codes into one shared table in array('I'). A transaction only becomes a
+dict when a route reads it, so the store costs a fraction of the memory of
+a list of dicts. Spending totals come from the SpendingSummary aggregates,
+not from scanning these columns.
+
+Rows that don't have exactly the standard fields with ISO dates are kept
+verbatim alongside the columns, so every transaction reads back unchanged.
+"""
+import bisect
+from array import array
+from collections.abc import Sequence
+from datetime import date
+
+from indexes import day_ordinal
+
+STANDARD_FIELDS = ('id', 'user_id', 'description', 'amount', 'category', 'date')
+
+
+class _Partition:
+    """One user's transactions, column by column"""
+    __slots__ = ('ids', 'descriptions', 'amounts', 'days', 'categories', 'verbatim')
+
+    def __init__(self):
+        self.ids = []
+        self.descriptions = []
+        self.amounts = array('d')
+        self.days = array('i')
+        self.categories = array('I')
+        # Original dicts of non-standard rows, created on first use
+        self.verbatim = None
+
+    def range(self, start_day=None, end_day=None):
+        """Row positions [lo, hi) with start_day <= day <= end_day"""
+        lo = 0 if start_day is None else bisect.bisect_left(self.days, start_day)
+        hi = len(self.days) if end_day is None else bisect.bisect_right(self.days, end_day)
+        return lo, hi
+
+
+class TransactionRows(Sequence):
+    """Read-only sequence of one user's transactions that builds dicts on access"""
+
+    def __init__(self, store, user_id, partition):
+        self._store = store
+        self._user_id = user_id
+        self._partition = partition
+
+    def __len__(self):
+        return len(self._partition.ids) if self._partition else 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._store._row(self._user_id, self._partition, i)
+                    for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('transaction index out of range')
+        return self._store._row(self._user_id, self._partition, index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._store._row(self._user_id, self._partition, i)
+
+
+class ColumnarTransactions:
+    def __init__(self):
+        """Empty store; interchangeable with UserPartitions for transactions"""
+        self.partitions = {}
+        self.category_names = []
+        self.category_codes = {}
+        self.count = 0
+
+    def _category_code(self, category) -> int:
+        code = self.category_codes.get(category)
+        if code is None:
+            code = self.category_codes[category] = len(self.category_names)
+            self.category_names.append(category)
+        return code
+
+    def rebuild(self, transactions: list):
+        """Load every transaction from scratch"""
+        self.partitions = {}
+        self.count = 0
+        # Sorting once up front turns every insert into an append
+        for transaction in sorted(transactions, key=lambda t: day_ordinal(t.get('date'))):
+            self.add(transaction)
+
+    def add(self, transaction: dict):
+        """Insert a transaction into its user's columns, after any on the same day"""
+        user_id = transaction.get('user_id')
+        partition = self.partitions.get(user_id)
+        if partition is None:
+            partition = self.partitions[user_id] = _Partition()
+
+        day = day_ordinal(transaction.get('date'))
+        standard = (len(transaction) == len(STANDARD_FIELDS)
+                    and all(field in transaction for field in STANDARD_FIELDS)
+                    and day and date.fromordinal(day).isoformat() == transaction['date']
+                    and isinstance(transaction['amount'], float))
+
+        position = bisect.bisect_right(partition.days, day)
+        partition.ids.insert(position, transaction.get('id'))
+        partition.descriptions.insert(position, transaction.get('description'))
+        partition.amounts.insert(position, float(transaction.get('amount', 0) or 0))
+        partition.days.insert(position, day)
+        partition.categories.insert(position, self._category_code(transaction.get('category', 'Other')))
+        if not standard and partition.verbatim is None:
+            partition.verbatim = [None] * (len(partition.ids) - 1)
+        if partition.verbatim is not None:
+            partition.verbatim.insert(position, None if standard else dict(transaction))
+        self.count += 1
+
+    def _row(self, user_id, partition, i) -> dict:
+        if partition.verbatim is not None and partition.verbatim[i] is not None:
+            return dict(partition.verbatim[i])
+        return {
+            'id': partition.ids[i],
+            'user_id': user_id,
+            'description': partition.descriptions[i],
+            'amount': partition.amounts[i],
+            'category': self.category_names[partition.categories[i]],
+            'date': date.fromordinal(partition.days[i]).isoformat()
+        }
+
+    def get(self, user_id: str) -> TransactionRows:
+        """The user's transactions in date order, as a lazily built sequence of dicts"""
+        return TransactionRows(self, user_id, self.partitions.get(user_id))
+
+    def between(self, user_id: str, start_day: int = None, end_day: int = None) -> list:
+        """The user's transactions dated start_day..end_day (ordinals, inclusive)"""
+        partition = self.partitions.get(user_id)
+        if partition is None:
+            return []
+        lo, hi = partition.range(start_day, end_day)
+        return self.get(user_id)[lo:hi]
+
+    def iter_between(self, user_id: str, start_day: int = None, end_day: int = None):
+        """Like between(), but builds one dict at a time"""
+        partition = self.partitions.get(user_id)
+        if partition is None:
+            return
+        lo, hi = partition.range(start_day, end_day)
+        for i in range(lo, hi):
+            yield self._row(user_id, partition, i)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        """Every transaction as a dict, user by user"""
+        for user_id, partition in self.partitions.items():
+            for i in range(len(partition.ids)):
+                yield self._row(user_id, partition, i)
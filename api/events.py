@@ -0,0 +1,85 @@
+"""
+In-process publish/subscribe of per-user change events, for the /api/stream feed
+"""
+import queue
+import threading
+from collections import defaultdict
+
+# Sent to a subscriber that has been closed by the broker
+CLOSED = None
+
+
+class Subscription:
+    def __init__(self, broker, user_id: str, max_queued: int):
+        """One open stream's bounded queue of events"""
+        self.broker = broker
+        self.user_id = user_id
+        self.events = queue.Queue(maxsize=max_queued)
+
+    def offer(self, event):
+        """Queue an event without blocking, dropping the oldest one when full
+
+        Events only say that something changed, so a reader that falls behind
+        loses nothing by skipping to the newest.
+        """
+        while True:
+            try:
+                self.events.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self.events.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout: float):
+        """Next event, CLOSED once the broker has dropped this subscription, or queue.Empty on timeout"""
+        return self.events.get(timeout=timeout)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class EventBroker:
+    def __init__(self, max_queued: int = 16, max_subscribers: int = 8):
+        """Per-user channels of subscribers, each with a bounded queue
+
+        A user opening more than max_subscribers streams closes their oldest one.
+        """
+        self.max_queued = max_queued
+        self.max_subscribers = max_subscribers
+        self._channels = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: str) -> Subscription:
+        subscription = Subscription(self, user_id, self.max_queued)
+        with self._lock:
+            channel = self._channels[user_id]
+            channel.append(subscription)
+            evicted = channel[:-self.max_subscribers]
+            del channel[:-self.max_subscribers]
+        for old in evicted:
+            old.offer(CLOSED)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            channel = self._channels.get(subscription.user_id)
+            if channel and subscription in channel:
+                channel.remove(subscription)
+                if not channel:
+                    del self._channels[subscription.user_id]
+
+    def publish(self, user_id: str, event: dict) -> int:
+        """Hand an event to every open stream of the user; returns how many there were"""
+        with self._lock:
+            subscribers = list(self._channels.get(user_id, ()))
+        for subscription in subscribers:
+            subscription.offer(event)
+        return len(subscribers)
+
+    def subscriber_count(self, user_id: str = None) -> int:
+        with self._lock:
+            if user_id is not None:
+                return len(self._channels.get(user_id, ()))
+            return sum(len(channel) for channel in self._channels.values())
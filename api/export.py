@@ -0,0 +1,75 @@
+"""
+Streaming CSV and JSON Lines export of a user's data
+"""
+import csv
+import json
+
+CSV_HEADER = ['Date', 'Description', 'Amount', 'Category']
+# Rows per chunk handed to the server - big enough to keep the number of
+# writes down, small enough that memory stays flat however long the export
+CHUNK_ROWS = 500
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller"""
+
+    def write(self, value):
+        return value
+
+
+def _chunked(lines):
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= CHUNK_ROWS:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def _csv_lines(transactions, budgets, goals):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADER)
+    for t in transactions:
+        yield writer.writerow([t['date'], t['description'], t['amount'], t['category']])
+
+    # Extra collections follow as their own sections after a blank line
+    if budgets is not None:
+        yield writer.writerow([])
+        yield writer.writerow(['Budget Category', 'Budget Amount'])
+        for category, amount in budgets.items():
+            yield writer.writerow([category, amount])
+    if goals is not None:
+        yield writer.writerow([])
+        yield writer.writerow(['Goal', 'Target Amount', 'Current Amount', 'Deadline', 'Category'])
+        for g in goals:
+            yield writer.writerow([g.get('title'), g.get('target_amount'), g.get('current_amount'),
+                                   g.get('deadline'), g.get('category')])
+
+
+def _jsonl_lines(transactions, budgets, goals):
+    def line(record_type, record):
+        return json.dumps({'type': record_type, **record}, ensure_ascii=False) + '\n'
+
+    for t in transactions:
+        yield line('transaction', t)
+    if budgets is not None:
+        for category, amount in budgets.items():
+            yield line('budget', {'category': category, 'amount': amount})
+    if goals is not None:
+        for g in goals:
+            yield line('goal', g)
+
+
+def stream_export(transactions, fmt: str = 'csv', budgets: dict = None, goals: list = None):
+    """Yield the export in chunks as transactions are read from the iterator
+
+    budgets and goals are appended when given; the header goes out before
+    the first transaction is read, so the download starts right away.
+    """
+    lines = _jsonl_lines if fmt == 'jsonl' else _csv_lines
+    generator = lines(transactions, budgets, goals)
+    if fmt != 'jsonl':
+        yield next(generator)
+    yield from _chunked(generator)
@@ -0,0 +1,115 @@
+"""
+Bulk transaction import from CSV (the export_data layout) or a JSON array
+"""
+import csv
+import io
+import json
+import uuid
+from collections import Counter
+from datetime import datetime
+
+CSV_COLUMNS = ('date', 'description', 'amount', 'category')
+# Report at most this many row errors, so a wrong file can't produce a huge response
+MAX_REPORTED_ERRORS = 100
+
+
+def csv_rows(lines):
+    """Yield (row number, fields) from CSV text lines with a Date/Description/Amount/Category header"""
+    reader = csv.reader(lines)
+    try:
+        header = [name.strip().lower() for name in next(reader, [])]
+        missing = [column for column in CSV_COLUMNS if column not in header]
+        if missing:
+            raise ValueError(f"CSV header is missing column(s): {', '.join(missing)}")
+        positions = {column: header.index(column) for column in CSV_COLUMNS}
+
+        for row in reader:
+            # An export with include=budgets,goals continues with other sections after a blank line
+            if not any(cell.strip() for cell in row):
+                break
+            yield reader.line_num, {column: row[i] if i < len(row) else '' for column, i in positions.items()}
+    except csv.Error as e:
+        # Oversized fields, NUL bytes and the like - the rest of the file can't be trusted
+        raise ValueError(f"malformed CSV at line {reader.line_num}: {e}") from None
+
+
+def json_rows(data):
+    """Yield (item number, fields) from a parsed JSON array of transaction objects"""
+    if not isinstance(data, list):
+        raise ValueError("JSON import must be an array of transactions")
+    for number, item in enumerate(data, 1):
+        yield number, item if isinstance(item, dict) else {}
+
+
+def validate(fields: dict) -> dict:
+    """Normalised transaction fields, or ValueError naming the first problem"""
+    description = str(fields.get('description') or '').strip()
+    category = str(fields.get('category') or '').strip()
+    date = str(fields.get('date') or '').strip()
+    if not description or not category or not date:
+        raise ValueError("date, description, amount and category are required")
+    try:
+        datetime.strptime(date, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f"invalid date {date!r}, expected YYYY-MM-DD") from None
+    try:
+        # JSON true/false would otherwise pass as 1.0/0.0
+        if isinstance(fields.get('amount'), bool):
+            raise TypeError
+        amount = float(fields.get('amount'))
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid amount {fields.get('amount')!r}") from None
+    if not amount or amount != amount or amount in (float('inf'), float('-inf')):
+        raise ValueError(f"invalid amount {fields.get('amount')!r}")
+    return {'description': description, 'amount': amount, 'category': category, 'date': date}
+
+
+def _key(t):
+    return t['date'], t['description'], round(float(t['amount']), 2), t['category']
+
+
+def plan_import(storage, user_id: str, rows):
+    """Validate rows in one pass and drop those already stored
+
+    Returns (new transactions, duplicate count, reported errors, error count).
+    A row is a duplicate while there are identical stored rows (same date,
+    description, amount and category) it hasn't been matched against yet, so
+    re-importing a file adds nothing but repeated purchases within a file are kept.
+    """
+    valid = []
+    errors = []
+    error_count = 0
+    for number, fields in rows:
+        try:
+            valid.append(validate(fields))
+        except ValueError as e:
+            error_count += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({'row': number, 'error': str(e)})
+
+    if not valid:
+        return [], 0, errors, error_count
+
+    dates = [t['date'] for t in valid]
+    existing = Counter(_key(t) for t in storage.iter_user_transactions(user_id, min(dates), max(dates)))
+    new = []
+    duplicates = 0
+    for fields in valid:
+        key = _key(fields)
+        if existing[key]:
+            existing[key] -= 1
+            duplicates += 1
+            continue
+        new.append({'id': str(uuid.uuid4()), 'user_id': user_id, **fields})
+    return new, duplicates, errors, error_count
+
+
+def load_rows(stream, fmt: str):
+    """Rows from a binary upload stream in the given format ('csv' or 'json')
+
+    CSV is decoded and parsed line by line as the rows are consumed.
+    """
+    if fmt == 'json':
+        return json_rows(json.load(stream))
+    # utf-8-sig drops the byte order mark spreadsheet programs put in front
+    return csv_rows(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
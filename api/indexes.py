@@ -0,0 +1,144 @@
+"""
+In-memory indexes for the JSON storage backend
+"""
+import bisect
+import heapq
+from datetime import date, datetime, timedelta
+
+
+class UserIndex:
+    def __init__(self):
+        """Lookup tables from user id, email and reset token to the user record"""
+        self.by_id = {}
+        self.by_email = {}
+        self.by_reset_token = {}
+        # user id -> (email, reset_token, reset expiry) as last indexed, so stale keys
+        # can be dropped even when the user dict was edited in place before re-indexing
+        self._keys = {}
+        # Min-heap of (expiry, user id, reset token); entries for tokens that
+        # were used or replaced since are skipped when they surface
+        self._expiries = []
+
+    def rebuild(self, users: dict):
+        """Index every user from scratch"""
+        self.by_id = {}
+        self.by_email = {}
+        self.by_reset_token = {}
+        self._keys = {}
+        self._expiries = []
+        for user in users.values():
+            self.add(user)
+
+    def add(self, user: dict):
+        """Index a new user or refresh the entries of a changed one"""
+        user_id = user.get('id')
+        previous = self._keys.get(user_id)
+        self.remove(user_id)
+
+        email = user.get('email')
+        token = user.get('reset_token')
+        self.by_id[user_id] = user
+        # On duplicate emails the first indexed user keeps the entry, like a scan would
+        if email and (email not in self.by_email or self.by_email[email].get('id') == user_id):
+            self.by_email[email] = user
+        expires = reset_expiry(user) if token else None
+        if token:
+            self.by_reset_token[token] = user
+            if expires and previous != (email, token, expires):
+                heapq.heappush(self._expiries, (expires, user_id, token))
+        self._keys[user_id] = (email, token, expires)
+
+    def remove(self, user_id: str):
+        """Drop every entry pointing at user_id"""
+        self.by_id.pop(user_id, None)
+        email, token, _ = self._keys.pop(user_id, (None, None, None))
+        if email and self.by_email.get(email, {}).get('id') == user_id:
+            del self.by_email[email]
+        if token and self.by_reset_token.get(token, {}).get('id') == user_id:
+            del self.by_reset_token[token]
+
+    def pop_expired(self, now: datetime) -> list:
+        """Users whose current reset token expired by `now`, in O(log n) per token"""
+        expired = []
+        while self._expiries and self._expiries[0][0] <= now:
+            expires, user_id, token = heapq.heappop(self._expiries)
+            # Skip entries for tokens used, replaced or given a new expiry since
+            if self._keys.get(user_id, (None, None, None))[1:] == (token, expires):
+                expired.append(self.by_id[user_id])
+        return expired
+
+
+def reset_expiry(user: dict):
+    """The user's reset_expires as a naive local datetime, or None if missing or malformed"""
+    try:
+        expires = datetime.fromisoformat(str(user.get('reset_expires')))
+    except ValueError:
+        return None
+    return expires.astimezone().replace(tzinfo=None) if expires.tzinfo else expires
+
+
+class UserPartitions:
+    def __init__(self, sort_key=None):
+        """Per-user lists of records, optionally kept sorted by sort_key"""
+        self.sort_key = sort_key
+        self.by_user = {}
+
+    def rebuild(self, records: list):
+        """Partition every record from scratch"""
+        self.by_user = {}
+        for record in records:
+            self.by_user.setdefault(record.get('user_id'), []).append(record)
+        if self.sort_key:
+            # Stable sort, so records with equal keys keep their original order
+            for user_records in self.by_user.values():
+                user_records.sort(key=self.sort_key)
+
+    def add(self, record: dict):
+        """Add a record to its user's partition, after any with an equal key"""
+        user_records = self.by_user.setdefault(record.get('user_id'), [])
+        if self.sort_key:
+            bisect.insort_right(user_records, record, key=self.sort_key)
+        else:
+            user_records.append(record)
+
+    def get(self, user_id: str) -> list:
+        """The user's records - shared with the index, so treat it as read-only"""
+        return self.by_user.get(user_id, [])
+
+
+def transaction_date_key(transaction: dict) -> str:
+    """Sort key for transactions - ISO dates order correctly as strings"""
+    return transaction.get('date') or ''
+
+
+def newest_first(records, cursor=None, start: str = None, end: str = None):
+    """Yield date-sorted records newest first, in (date, id) descending order
+
+    Only records dated start..end (ISO dates, inclusive) are yielded and, given a
+    (date, id) cursor, only those that come after it in that order.
+    """
+    lo = 0 if start is None else bisect.bisect_left(records, start, key=transaction_date_key)
+    hi = len(records) if end is None else bisect.bisect_left(records, day_after(end), key=transaction_date_key)
+    if cursor is not None:
+        hi = min(hi, bisect.bisect_right(records, cursor[0], key=transaction_date_key))
+    while hi > lo:
+        # Records sharing a date are kept in insertion order, so order each run by id
+        day = transaction_date_key(records[hi - 1])
+        run_start = bisect.bisect_left(records, day, lo, hi, key=transaction_date_key)
+        for record in sorted(records[run_start:hi], key=lambda r: r.get('id') or '', reverse=True):
+            if cursor is None or day < cursor[0] or (record.get('id') or '') < cursor[1]:
+                yield record
+        hi = run_start
+
+
+def day_ordinal(value) -> int:
+    """Day ordinal of an ISO date (or datetime) string, 0 when it can't be parsed"""
+    try:
+        return date.fromisoformat(str(value)[:10]).toordinal()
+    except ValueError:
+        return 0
+
+
+def day_after(day: str) -> str:
+    """ISO date of the day after `day` - every timestamp on `day` sorts below it"""
+    return (date.fromisoformat(day[:10]) + timedelta(days=1)).isoformat()
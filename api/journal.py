@@ -0,0 +1,72 @@
+"""
+Append-only change journal for the Budget App data files
+"""
+import json
+import os
+
+
+class Journal:
+    def __init__(self, path: str, compact_every: int = 1000):
+        """Open a journal stored at path (the file is created on first append)"""
+        self.path = path
+        self.compact_every = compact_every
+        self.size = 0
+
+    def append(self, op: str, data: dict):
+        """Append one compact record and make it durable"""
+        self.append_many([(op, data)])
+
+    def append_many(self, records: list):
+        """Append (op, data) records with a single write and fsync (group commit)"""
+        if not records:
+            return
+        lines = ''.join(
+            json.dumps({'op': op, 'data': data}, separators=(',', ':'), ensure_ascii=False) + '\n'
+            for op, data in records)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        self.size += len(records)
+
+    def replay(self):
+        """Yield (op, data) for every record in the journal, oldest first"""
+        self.size = 0
+        if not os.path.exists(self.path):
+            return
+        # End of the last complete line, where the next append has to start
+        end = 0
+        with open(self.path, 'rb') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.endswith(b'\n'):
+                    # A torn final write from a crash - everything before it is intact
+                    print(f"Skipping unreadable journal record at line {line_number}")
+                    break
+                end += len(line)
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    print(f"Skipping unreadable journal record at line {line_number}")
+                    continue
+                self.size += 1
+                yield record['op'], record['data']
+
+        # Cut the torn tail off, or the next append would be glued onto it
+        if end < os.path.getsize(self.path):
+            try:
+                os.truncate(self.path, end)
+            except OSError as e:
+                print(f"Error trimming journal: {e}")
+
+    def needs_compaction(self) -> bool:
+        """True once enough records have piled up to be worth a snapshot"""
+        return self.size >= self.compact_every
+
+    def truncate(self):
+        """Drop all records after they have been folded into a snapshot"""
+        with open(self.path, 'w', encoding='utf-8'):
+            pass
+        self.size = 0
@@ -0,0 +1,122 @@
+"""
+Salted password hashing with a tunable work factor, run on a bounded thread pool
+"""
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+
+ALGORITHMS = ('pbkdf2_sha256', 'scrypt')
+# OWASP's recommended minimum for PBKDF2-HMAC-SHA256
+DEFAULT_ITERATIONS = 600_000
+# scrypt cost; memory use is 128 * N * r bytes (16 MiB at the default)
+DEFAULT_SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).decode().rstrip('=')
+
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> str:
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations)
+    return f'pbkdf2_sha256${iterations}${_b64(salt)}${_b64(digest)}'
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> str:
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r)
+    return f'scrypt${n}${r}${p}${_b64(salt)}${_b64(digest)}'
+
+
+def is_legacy(stored: str) -> bool:
+    """Whether `stored` is an unsalted SHA-256 hex digest from before KDF hashing"""
+    return len(stored) == 64 and '$' not in stored
+
+
+def _rehash_like(password: str, stored: str):
+    """Hash `password` with the algorithm, parameters and salt in `stored`; None if unrecognised"""
+    parts = stored.split('$')
+    try:
+        if parts[0] == 'pbkdf2_sha256' and len(parts) == 4:
+            return _pbkdf2(password, _unb64(parts[2]), int(parts[1]))
+        if parts[0] == 'scrypt' and len(parts) == 6:
+            return _scrypt(password, _unb64(parts[4]), int(parts[1]), int(parts[2]), int(parts[3]))
+    except ValueError:
+        return None
+    if is_legacy(stored):
+        return hashlib.sha256(password.encode()).hexdigest()
+    return None
+
+
+class PasswordHasher:
+    def __init__(self, algorithm: str = 'pbkdf2_sha256', iterations: int = DEFAULT_ITERATIONS,
+                 scrypt_n: int = DEFAULT_SCRYPT_N, workers: int = None):
+        """Hashes on at most `workers` threads (default one per CPU)
+
+        hashlib's KDFs release the GIL, so hashes on the pool run in parallel
+        and a burst of logins queues here instead of starving other requests.
+        """
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"algorithm must be one of {', '.join(ALGORITHMS)}")
+        self.algorithm = algorithm
+        self.iterations = iterations
+        self.scrypt_n = scrypt_n
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+        # Hash of a random password, checked against when there's no real hash
+        self._decoy = None
+
+    def _prefix(self) -> str:
+        if self.algorithm == 'scrypt':
+            return f'scrypt${self.scrypt_n}${SCRYPT_R}${SCRYPT_P}$'
+        return f'pbkdf2_sha256${self.iterations}$'
+
+    def _hash_now(self, password: str) -> str:
+        salt = secrets.token_bytes(SALT_BYTES)
+        if self.algorithm == 'scrypt':
+            return _scrypt(password, salt, self.scrypt_n, SCRYPT_R, SCRYPT_P)
+        return _pbkdf2(password, salt, self.iterations)
+
+    def hash(self, password: str) -> str:
+        """Salted hash of `password` with the current settings"""
+        return self._pool.submit(self._hash_now, password).result()
+
+    def verify(self, password: str, stored: str) -> bool:
+        """Whether `password` matches `stored`, in any supported format, compared in constant time"""
+        if not password or not stored:
+            return False
+        candidate = self._pool.submit(_rehash_like, password, stored).result()
+        return candidate is not None and hmac.compare_digest(candidate.encode(), stored.encode())
+
+    def reject(self, password: str) -> bool:
+        """Spend one verify()'s work and return False, for logins to unknown accounts
+
+        Failing fast would let response times tell which emails are registered.
+        """
+        if self._decoy is None:
+            self._decoy = self.hash(secrets.token_urlsafe(16))
+        self.verify(password or '-', self._decoy)
+        return False
+
+    def needs_rehash(self, stored: str) -> bool:
+        """Whether `stored` is legacy or uses other settings than the current ones"""
+        return not (stored or '').startswith(self._prefix())
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+
+def hasher_from_env() -> PasswordHasher:
+    """The hasher configured by PASSWORD_HASH, PASSWORD_ITERATIONS, PASSWORD_SCRYPT_N and PASSWORD_WORKERS"""
+    return PasswordHasher(os.environ.get('PASSWORD_HASH', 'pbkdf2_sha256'),
+                          int(os.environ.get('PASSWORD_ITERATIONS', DEFAULT_ITERATIONS)),
+                          int(os.environ.get('PASSWORD_SCRYPT_N', DEFAULT_SCRYPT_N)),
+                          int(os.environ.get('PASSWORD_WORKERS', 0)) or None)
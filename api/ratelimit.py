@@ -0,0 +1,123 @@
+"""
+Token-bucket rate limiting, in process memory or in SQLite shared by every worker
+
+Each key (a client IP or a user) has a bucket of `capacity` tokens refilled
+at `refill` tokens per second. A request takes its cost in tokens, or is
+refused with the seconds until enough have refilled.
+"""
+import math
+import os
+import threading
+import time
+
+from sqlitedb import ThreadConnections
+
+RATE_LIMIT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+
+def _refill(tokens: float, updated: float, now: float, capacity: float, refill: float) -> float:
+    return min(capacity, tokens + max(0.0, now - updated) * refill)
+
+
+def _wait(tokens: float, cost: float, refill: float) -> float:
+    """Seconds until `tokens` grows to `cost`"""
+    return (cost - tokens) / refill if refill > 0 else math.inf
+
+
+class MemoryBuckets:
+    # Full buckets are forgotten once the table grows past this many keys
+    PRUNE_ABOVE = 10000
+
+    def __init__(self):
+        """Buckets in process memory - each worker limits on its own"""
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, cost: float, capacity: float, refill: float, now: float) -> float:
+        """Take `cost` tokens from `key`'s bucket: 0 if taken, else the seconds to wait"""
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = _refill(tokens, updated, now, capacity, refill)
+            if tokens < cost:
+                self._buckets[key] = (tokens, now)
+                return _wait(tokens, cost, refill)
+            self._buckets[key] = (tokens - cost, now)
+            if len(self._buckets) > self.PRUNE_ABOVE:
+                self._buckets = {k: (t, u) for k, (t, u) in self._buckets.items()
+                                 if _refill(t, u, now, capacity, refill) < capacity}
+            return 0.0
+
+
+class SQLiteBuckets:
+    # Full buckets are deleted on every this many takes
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path: str):
+        """Buckets in a SQLite database (WAL mode), so all workers on the host share one limit"""
+        self.path = path
+        # Autocommit, so take() can open its own BEGIN IMMEDIATE transaction
+        self._connections = ThreadConnections(path, isolation_level=None)
+        self._takes = 0
+        self._connections.get().executescript(RATE_LIMIT_SCHEMA)
+
+    def take(self, key: str, cost: float, capacity: float, refill: float, now: float) -> float:
+        """Take `cost` tokens from `key`'s bucket: 0 if taken, else the seconds to wait"""
+        conn = self._connections.get()
+        self._takes += 1
+        # IMMEDIATE takes the write lock up front, so two workers can't both spend the same tokens
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM rate_buckets WHERE key = ?', (key,)).fetchone()
+            tokens = _refill(*(row or (capacity, now)), now, capacity, refill)
+            wait = _wait(tokens, cost, refill) if tokens < cost else 0.0
+            conn.execute('INSERT INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?) '
+                         'ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated',
+                         (key, tokens if wait else tokens - cost, now))
+            if self._takes % self.PRUNE_EVERY == 0:
+                conn.execute('DELETE FROM rate_buckets WHERE MIN(?, tokens + (? - updated) * ?) >= ?',
+                             (capacity, now, refill, capacity))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+
+class RateLimiter:
+    def __init__(self, buckets, capacity: float = 120, refill: float = 2.0):
+        """Every key gets `capacity` tokens, refilled at `refill` per second"""
+        self.buckets = buckets
+        self.capacity = capacity
+        self.refill = refill
+
+    def check(self, keys, cost: float = 1) -> int:
+        """Charge `cost` to each of `keys`; 0 if allowed, else the whole seconds to Retry-After
+
+        A request costing more than the capacity could never pass, so it takes a full bucket.
+        """
+        cost = min(cost, self.capacity)
+        now = time.time()
+        for key in keys:
+            wait = self.buckets.take(key, cost, self.capacity, self.refill, now)
+            if wait:
+                return max(1, math.ceil(wait))
+        return 0
+
+
+def limiter_from_env(data_dir: str):
+    """The limiter configured by RATE_LIMIT_BACKEND (memory, sqlite or off), or None when off"""
+    backend = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+    if backend == 'off':
+        return None
+    if backend == 'sqlite':
+        buckets = SQLiteBuckets(os.environ.get('RATE_LIMIT_DB') or os.path.join(data_dir, 'ratelimit.db'))
+    else:
+        buckets = MemoryBuckets()
+    return RateLimiter(buckets, float(os.environ.get('RATE_LIMIT_CAPACITY', 120)),
+                       float(os.environ.get('RATE_LIMIT_REFILL', 2)))
@@ -0,0 +1,193 @@
+"""
+Server-side sessions: the cookie carries only a random session id
+
+Session data lives in a SessionStore (SQLite, shared by every worker, or
+process memory). In front of it, ResolvedUsers keeps an in-process LRU of
+each session's user record, trusted for a few seconds after it was read.
+"""
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from sqlitedb import ThreadConnections
+
+SESSIONS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires);
+"""
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, data: dict = None, sid: str = None):
+        """Session data keyed by `sid` (None until the session is first saved)"""
+        def on_update(session):
+            session.modified = True
+
+        super().__init__(data, on_update)
+        self.sid = sid
+        self.modified = False
+        # The user the session was loaded for, so logins and logouts get a new id
+        self.loaded_user_id = (data or {}).get('user_id')
+
+
+class MemorySessionStore:
+    def __init__(self):
+        """Sessions in process memory - for one process, tests and development"""
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    def load(self, sid: str):
+        with self._lock:
+            row = self._rows.get(sid)
+        if row and row[1] > time.time():
+            return json.loads(row[0])
+        return None
+
+    def save(self, sid: str, data: dict, expires: float):
+        with self._lock:
+            self._rows[sid] = (json.dumps(data), expires)
+            # Expired sessions are dropped as the store grows
+            if len(self._rows) % 1000 == 0:
+                now = time.time()
+                self._rows = {key: row for key, row in self._rows.items() if row[1] > now}
+
+    def delete(self, sid: str):
+        with self._lock:
+            self._rows.pop(sid, None)
+
+
+class SQLiteSessionStore:
+    # Expired rows are deleted on every this many saves
+    PURGE_EVERY = 1000
+
+    def __init__(self, path: str):
+        """Sessions in a SQLite database (WAL mode), shared by every worker on the host"""
+        self.path = path
+        self._connections = ThreadConnections(path)
+        self._saves = 0
+        with self._connections.get() as conn:
+            conn.executescript(SESSIONS_SCHEMA)
+
+    def load(self, sid: str):
+        row = self._connections.get().execute(
+            'SELECT data FROM sessions WHERE id = ? AND expires > ?', (sid, time.time())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, sid: str, data: dict, expires: float):
+        self._saves += 1
+        with self._connections.get() as conn:
+            conn.execute('INSERT INTO sessions (id, data, expires) VALUES (?, ?, ?) '
+                         'ON CONFLICT(id) DO UPDATE SET data = excluded.data, expires = excluded.expires',
+                         (sid, json.dumps(data), expires))
+            if self._saves % self.PURGE_EVERY == 0:
+                conn.execute('DELETE FROM sessions WHERE expires <= ?', (time.time(),))
+
+    def delete(self, sid: str):
+        with self._connections.get() as conn:
+            conn.execute('DELETE FROM sessions WHERE id = ?', (sid,))
+
+
+class ServerSessionInterface(SessionInterface):
+    def __init__(self, store):
+        """Flask session interface keeping the data in `store` and only its id in the cookie"""
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        data = self.store.load(sid) if sid else None
+        if data is None:
+            return ServerSession()
+        return ServerSession(data, sid)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.sid is not None:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        # A new id whenever the user changes, so an id planted before login is useless after it
+        if session.sid is not None and session.get('user_id') != session.loaded_user_id:
+            self.store.delete(session.sid)
+            session.sid = None
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+            session.modified = True
+
+        if not self.should_set_cookie(app, session):
+            return
+        if session.modified:
+            self.store.save(session.sid, dict(session), time.time() + app.permanent_session_lifetime.total_seconds())
+        response.set_cookie(name, session.sid, expires=self.get_expiration_time(app, session),
+                            httponly=self.get_cookie_httponly(app), domain=domain, path=path,
+                            secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app))
+
+
+class ResolvedUsers:
+    def __init__(self, storage, max_sessions: int = 10000, ttl: float = 10.0):
+        """LRU of session id -> (user id, user record, when it was read)
+
+        Entries are trusted for `ttl` seconds without asking storage anything,
+        so a profile changed through another worker shows up within that time.
+        """
+        self.storage = storage
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sid: str, user_id: str):
+        """The session's user - one dict hit while the cached record is fresh"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(sid)
+            if cached and cached[0] == user_id and now - cached[2] < self.ttl:
+                self._entries.move_to_end(sid)
+                return cached[1]
+
+        user = self.storage.get_user_by_id(user_id)
+        with self._lock:
+            self._entries[sid] = (user_id, user, now)
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+        return user
+
+    def discard(self, sid: str):
+        with self._lock:
+            self._entries.pop(sid, None)
+
+
+def create_session_interface(data_dir: str):
+    """The interface selected by SESSION_BACKEND (sqlite, memory or cookie), or None for cookie
+
+    Defaults to the signed cookie on Vercel (no writable shared disk), memory
+    alongside the memory storage backend, and SQLite otherwise.
+    """
+    backend = os.environ.get('SESSION_BACKEND')
+    if not backend:
+        if os.environ.get('VERCEL'):
+            backend = 'cookie'
+        elif os.environ.get('STORAGE_BACKEND') == 'memory':
+            backend = 'memory'
+        else:
+            backend = 'sqlite'
+    if backend == 'cookie':
+        return None
+    if backend == 'memory':
+        return ServerSessionInterface(MemorySessionStore())
+    return ServerSessionInterface(SQLiteSessionStore(os.environ.get('SESSION_DB') or os.path.join(data_dir, 'sessions.db')))
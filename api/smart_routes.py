@@ -4,12 +4,13 @@ Smart AI Routes for Budget App
 import os
 import sys
 
-# Add parent directory to path for imports
+# Add parent directory (smart_features) and this directory (storage) to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from flask import Blueprint, render_template, jsonify, request, session
 from smart_features import smart_ai
-from supabase_config import get_supabase_manager
+from storage import get_storage
 
 smart_bp = Blueprint('smart', __name__)
 
@@ -20,11 +21,11 @@ def ai_analysis():
         return jsonify({"error": "Not logged in"}), 401
     
     try:
-        supabase = get_supabase_manager()
+        storage = get_storage()
         user_id = session['user_id']
         
         # Get user transactions
-        transactions = supabase.get_user_transactions(user_id)
+        transactions = list(storage.get_user_transactions(user_id))
         
         # Get AI analysis
         analysis = smart_ai.analyze_spending_patterns(transactions)
@@ -40,11 +41,11 @@ def ai_predictions():
         return jsonify({"error": "Not logged in"}), 401
     
     try:
-        supabase = get_supabase_manager()
+        storage = get_storage()
         user_id = session['user_id']
         
         # Get user transactions
-        transactions = supabase.get_user_transactions(user_id)
+        transactions = list(storage.get_user_transactions(user_id))
         
         # Get AI predictions
         predictions = smart_ai.predict_future_spending(transactions)
@@ -60,12 +61,12 @@ def smart_recommendations():
         return jsonify({"error": "Not logged in"}), 401
     
     try:
-        supabase = get_supabase_manager()
+        storage = get_storage()
         user_id = session['user_id']
         
         # Get user data
-        transactions = supabase.get_user_transactions(user_id)
-        budgets = supabase.get_user_budgets(user_id)
+        transactions = list(storage.get_user_transactions(user_id))
+        budgets = storage.get_user_budgets(user_id)
         
         # Get AI recommendations
         recommendations = smart_ai.generate_smart_recommendations(transactions, budgets)
@@ -81,12 +82,12 @@ def budget_optimizer():
         return jsonify({"error": "Not logged in"}), 401
     
     try:
-        supabase = get_supabase_manager()
+        storage = get_storage()
         user_id = session['user_id']
         
         # Get user data
-        user_profile = supabase.get_user_profile(user_id)
-        goals = supabase.get_user_goals(user_id)
+        user_profile = storage.get_user_by_id(user_id)
+        goals = storage.get_user_goals(user_id)
         
         income = user_profile.get('income', 0) if user_profile else 0
         
@@ -104,12 +105,12 @@ def goal_insights():
         return jsonify({"error": "Not logged in"}), 401
     
     try:
-        supabase = get_supabase_manager()
+        storage = get_storage()
         user_id = session['user_id']
         
         # Get user data
-        goals = supabase.get_user_goals(user_id)
-        transactions = supabase.get_user_transactions(user_id)
+        goals = storage.get_user_goals(user_id)
+        transactions = list(storage.get_user_transactions(user_id))
         
         # Get AI goal insights
         insights = smart_ai.generate_goal_insights(goals, transactions)
@@ -125,14 +126,14 @@ def api_smart_analysis():
         return jsonify({"error": "Not logged in"}), 401
     
     try:
-        supabase = get_supabase_manager()
+        storage = get_storage()
         user_id = session['user_id']
         
         # Get user data
-        transactions = supabase.get_user_transactions(user_id)
-        budgets = supabase.get_user_budgets(user_id)
-        goals = supabase.get_user_goals(user_id)
-        user_profile = supabase.get_user_profile(user_id)
+        transactions = list(storage.get_user_transactions(user_id))
+        budgets = storage.get_user_budgets(user_id)
+        goals = storage.get_user_goals(user_id)
+        user_profile = storage.get_user_by_id(user_id)
         
         # Comprehensive AI analysis
         analysis = smart_ai.analyze_spending_patterns(transactions)
@@ -0,0 +1,157 @@
+"""
+Compact binary snapshot of the JSON storage data
+
+Transactions are stored column by column: amounts as a packed array of
+doubles, user ids, categories and dates as small lookup tables plus packed
+integer codes, and ids/descriptions as single strings. Loading it avoids
+parsing millions of pretty-printed JSON tokens on cold start.
+
+Convert existing JSON files with:  python api/snapshot.py [data_dir]
+"""
+import json
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+MAGIC = b'BUDGETSNAP\x01'
+TRANSACTION_FIELDS = ('id', 'user_id', 'description', 'amount', 'category', 'date')
+
+
+def _dumps(value) -> bytes:
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _encode_column(values):
+    """Dictionary-encode a column into (distinct values, packed codes)"""
+    table = {}
+    codes = array('I', (table.setdefault(value, len(table)) for value in values))
+    return list(table), codes
+
+
+def _is_columnar(transactions: list) -> bool:
+    """Only rows with exactly the standard fields are stored column by column"""
+    for t in transactions:
+        if len(t) != len(TRANSACTION_FIELDS) or any(field not in t for field in TRANSACTION_FIELDS):
+            return False
+        if not isinstance(t['id'], str) or '\n' in t['id']:
+            return False
+        if isinstance(t['amount'], bool) or not isinstance(t['amount'], (int, float)):
+            return False
+    return True
+
+
+def encode_snapshot(users: dict, transactions: list, budgets: dict, goals: list) -> list:
+    """Encode all four collections into the sections write_sections() stores"""
+    columnar = _is_columnar(transactions)
+    meta = {'rows': len(transactions), 'columnar': columnar, 'byteorder': sys.byteorder}
+    sections = [_dumps(meta), _dumps(users), _dumps(budgets), _dumps(goals)]
+
+    if columnar:
+        for field in ('user_id', 'category', 'date'):
+            table, codes = _encode_column(t[field] for t in transactions)
+            sections += [_dumps(table), codes.tobytes()]
+        sections.append('\n'.join(t['id'] for t in transactions).encode('utf-8'))
+        sections.append(array('d', (t['amount'] for t in transactions)).tobytes())
+        sections.append(_dumps([t['description'] for t in transactions]))
+    else:
+        sections.append(_dumps(transactions))
+    return sections
+
+
+def write_sections(path: str, sections: list):
+    """Write encoded snapshot sections to path through a temp file and rename"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.snapshot.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC)
+            for section in sections:
+                f.write(struct.pack('<Q', len(section)))
+                f.write(section)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def write_snapshot(path: str, users: dict, transactions: list, budgets: dict, goals: list):
+    """Write all four collections to path through a temp file and rename"""
+    write_sections(path, encode_snapshot(users, transactions, budgets, goals))
+
+
+def read_snapshot(path: str):
+    """Return (users, transactions, budgets, goals) from a snapshot file"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not a budget snapshot")
+
+    view = memoryview(data)
+    position = len(MAGIC)
+
+    def section():
+        nonlocal position
+        (length,) = struct.unpack_from('<Q', data, position)
+        position += 8 + length
+        return view[position - length:position]
+
+    def json_section():
+        return json.loads(bytes(section()).decode('utf-8'))
+
+    def packed(typecode):
+        values = array(typecode)
+        values.frombytes(section())
+        if meta['byteorder'] != sys.byteorder:
+            values.byteswap()
+        return values
+
+    meta = json_section()
+    users = json_section()
+    budgets = json_section()
+    goals = json_section()
+
+    if not meta['columnar']:
+        return users, json_section(), budgets, goals
+
+    columns = {}
+    for field in ('user_id', 'category', 'date'):
+        table = json_section()
+        columns[field] = [table[code] for code in packed('I')]
+    ids = bytes(section()).decode('utf-8').split('\n')
+    if not meta['rows']:
+        ids = []
+    amounts = packed('d')
+    descriptions = json_section()
+
+    transactions = [
+        {'id': i, 'user_id': u, 'description': d, 'amount': a, 'category': c, 'date': dt}
+        for i, u, d, a, c, dt in zip(ids, columns['user_id'], descriptions, amounts,
+                                     columns['category'], columns['date'])
+    ]
+    return users, transactions, budgets, goals
+
+
+def main():
+    """Convert the JSON data files in a directory into snapshot.bin"""
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.dirname(os.path.abspath(__file__))
+    collections = {}
+    for name, default in (('users', {}), ('transactions', []), ('budgets', {}), ('goals', [])):
+        path = os.path.join(data_dir, f'{name}.json')
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                collections[name] = json.load(f)
+        else:
+            collections[name] = default
+
+    target = os.path.join(data_dir, 'snapshot.bin')
+    write_snapshot(target, collections['users'], collections['transactions'],
+                   collections['budgets'], collections['goals'])
+    print(f"✅ Wrote {len(collections['transactions'])} transactions to {target}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+"""
+One SQLite connection per thread, in WAL mode - shared by the SQLite-backed stores
+"""
+import sqlite3
+import threading
+
+
+class ThreadConnections:
+    def __init__(self, path: str, row_factory=None, **options):
+        """Connections to the database at path; `options` go to sqlite3.connect()"""
+        self.path = path
+        self.row_factory = row_factory
+        self.options = {'timeout': 5.0, **options}
+        self._local = threading.local()
+
+    def get(self):
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, **self.options)
+            if self.row_factory is not None:
+                conn.row_factory = self.row_factory
+            # WAL lets readers in every worker run alongside a single writer
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
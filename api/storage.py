@@ -0,0 +1,1048 @@
+"""
+Storage backends for the Budget App
+
+Every backend exposes the same methods (users by id/email/username/reset
+token, transactions overall or by date range, spending summaries, budgets
+and goals), so routes never touch the underlying data structures directly:
+
+- JSONStorage keeps everything in memory and persists to the JSON files
+  (optionally through the append-only journal)
+- MemoryStorage is JSONStorage without the files, for tests and development
+- SQLiteStorage keeps everything in a SQLite database in WAL mode, so
+  several workers share one consistent copy of the data
+- SupabaseStorage keeps everything in the Supabase Postgres tables
+
+Every mutation bumps the owning user's data version (get_data_version), so
+derived data such as the analytics snapshot can be cached until it changes.
+
+The app and the smart blueprint share one instance through get_storage().
+"""
+import atexit
+import bisect
+import itertools
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from aggregates import SpendingSummary
+from columnar import ColumnarTransactions
+from indexes import UserIndex, UserPartitions, day_after, day_ordinal, newest_first, transaction_date_key
+from journal import Journal
+from snapshot import encode_snapshot, read_snapshot, write_sections
+from sqlitedb import ThreadConnections
+from writebehind import WriteBehind
+
+def _page(rows: list, limit: int):
+    """Split limit + 1 fetched rows into (page, cursor of the next page or None)"""
+    if len(rows) <= limit:
+        return rows, None
+    last = rows[limit - 1]
+    return rows[:limit], (last['date'], last['id'])
+
+
+# Which JSON file each journaled operation changes
+OP_COLLECTIONS = {
+    'put_user': 'users',
+    'add_transaction': 'transactions',
+    'set_budget': 'budgets',
+    'add_goal': 'goals',
+    'update_goal': 'goals'
+}
+
+
+class JSONStorage:
+    def __init__(self, data_dir: str, mode: str = 'files', compact_every: int = 1000,
+                 write_behind: float = 0, snapshot_format: str = 'json', transaction_store: str = 'dicts'):
+        """Create a JSON file backend storing its files in data_dir
+
+        With write_behind > 0, changes are only marked dirty in the request and a
+        background thread writes them out at most once per write_behind seconds.
+        With snapshot_format='binary', journal compaction writes snapshot.bin
+        instead of the JSON files. With transaction_store='columnar', transactions
+        are held in packed per-user columns instead of a list of dicts.
+        """
+        self.data_dir = data_dir
+        self.mode = mode
+        self.users_file = os.path.join(data_dir, 'users.json')
+        self.transactions_file = os.path.join(data_dir, 'transactions.json')
+        self.budgets_file = os.path.join(data_dir, 'budgets.json')
+        self.goals_file = os.path.join(data_dir, 'goals.json')
+        self.snapshot_file = os.path.join(data_dir, 'snapshot.bin')
+        self.snapshot_format = snapshot_format
+        self.journal = Journal(os.path.join(data_dir, 'journal.log'), compact_every)
+
+        self.users = {}
+        self.transactions = []
+        self.budgets = {}
+        self.goals = []
+        self.user_index = UserIndex()
+        # Per-user views of transactions (in date order) and goals (in creation order)
+        self.columnar = transaction_store == 'columnar'
+        if self.columnar:
+            # The columns are the only copy - self.transactions points at them once loaded
+            self.user_transactions = ColumnarTransactions()
+        else:
+            self.user_transactions = UserPartitions(sort_key=transaction_date_key)
+        self.user_goals = UserPartitions()
+        self.spending = {}
+        # user id -> counter bumped by every change to that user's data; the
+        # counters restart with the process, so versions carry a per-process prefix
+        self.versions = {}
+        self.instance = uuid.uuid4().hex[:12]
+
+        # Guards the data against the background flusher reading it mid-change
+        self.lock = threading.RLock()
+        # Keeps flushes in order while they write outside self.lock
+        self.flush_lock = threading.Lock()
+        self.dirty = set()
+        # JSON files that are behind the data because it came from snapshot.bin
+        self.stale_files = set()
+        self.pending_records = []
+        self.write_behind = WriteBehind(self.flush, write_behind) if write_behind > 0 else None
+
+    # Loading and saving
+
+    def _load_file(self, path, default):
+        if not os.path.exists(path):
+            return default
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error loading {os.path.basename(path)}: {e}")
+            return default
+
+    def _snapshot_is_current(self) -> bool:
+        """True when snapshot.bin exists and no JSON file was written after it"""
+        if not os.path.exists(self.snapshot_file):
+            return False
+        snapshot_mtime = os.path.getmtime(self.snapshot_file)
+        return all(os.path.getmtime(path) <= snapshot_mtime
+                   for path, _ in self._collection_files().values() if os.path.exists(path))
+
+    def load_data(self):
+        """Load all data from snapshot.bin or the JSON files and replay the journal"""
+        loaded = False
+        if self._snapshot_is_current():
+            try:
+                self.users, self.transactions, self.budgets, self.goals = read_snapshot(self.snapshot_file)
+                self.stale_files = set(self._collection_files())
+                loaded = True
+            except Exception as e:
+                print(f"Error loading snapshot, falling back to JSON files: {e}")
+
+        if not loaded:
+            self.users = self._load_file(self.users_file, {})
+            self.transactions = self._load_file(self.transactions_file, [])
+            self.budgets = self._load_file(self.budgets_file, {})
+            self.goals = self._load_file(self.goals_file, [])
+        self.user_index.rebuild(self.users)
+        self.user_transactions.rebuild(self.transactions)
+        self.user_goals.rebuild(self.goals)
+        self.spending = {}
+        for transaction in self.transactions:
+            self.spending.setdefault(transaction.get('user_id'), SpendingSummary()).add(transaction)
+        if self.columnar:
+            self.transactions = self.user_transactions
+
+        # Replay changes recorded since the last snapshot
+        if self.mode == 'journal':
+            self.replay_journal()
+
+    def replay_journal(self):
+        """Apply every journaled change on top of the loaded snapshot"""
+        # Ids already in the snapshot, so records that were folded into it by a
+        # compaction interrupted before the journal was truncated aren't applied twice
+        seen_ids = None
+        try:
+            for op, data in self.journal.replay():
+                if op in ('add_transaction', 'add_goal'):
+                    if seen_ids is None:
+                        seen_ids = {t.get('id') for t in self.transactions} | {g.get('id') for g in self.goals}
+                    if data.get('id') in seen_ids:
+                        continue
+                    seen_ids.add(data.get('id'))
+                self.apply_change(op, data)
+        except Exception as e:
+            print(f"Error replaying journal: {e}")
+
+    def apply_change(self, op, data):
+        """Apply one journaled change to the in-memory data"""
+        if op == 'put_user':
+            self.users[data['username']] = data
+            self.user_index.add(data)
+        elif op == 'add_transaction':
+            self._add_transaction(data)
+        elif op == 'set_budget':
+            self.budgets[data['user_id']] = data['budgets']
+        elif op == 'add_goal':
+            self.goals.append(data)
+            self.user_goals.add(data)
+        elif op == 'update_goal':
+            # Older journal records don't carry the user id
+            candidates = self.user_goals.get(data['user_id']) if 'user_id' in data else self.goals
+            for goal in candidates:
+                if goal['id'] == data['id']:
+                    goal['current_amount'] = data['current_amount']
+                    break
+        else:
+            print(f"Unknown journal operation: {op}")
+
+    def _collection_files(self):
+        return {
+            'users': (self.users_file, self.users),
+            'transactions': (self.transactions_file, self.transactions),
+            'budgets': (self.budgets_file, self.budgets),
+            'goals': (self.goals_file, self.goals)
+        }
+
+    def _encode(self, data) -> str:
+        if isinstance(data, ColumnarTransactions):
+            data = list(data)
+        return json.dumps(data, indent=2, ensure_ascii=False)
+
+    def _write_file(self, path, text):
+        """Write through a temp file and rename, so readers never see a partial file"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.data_dir, prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _encode_files(self, collections=None):
+        """(collection, path, JSON text) to write for the given collections (all four by default)"""
+        files = self._collection_files()
+        # After loading from snapshot.bin every JSON file is behind, so write them
+        # all - a partial write would make the stale ones look current
+        return [(collection, files[collection][0], self._encode(files[collection][1]))
+                for collection in set(collections or files) | self.stale_files]
+
+    def _write_encoded(self, encoded):
+        """Write what _encode_files() returned, raising on failure"""
+        os.makedirs(self.data_dir, exist_ok=True)
+        for collection, path, text in encoded:
+            self._write_file(path, text)
+        with self.lock:
+            self.stale_files -= {collection for collection, _, _ in encoded}
+
+    def write_files(self, collections=None):
+        """Rewrite the JSON files of the given collections (all four by default), raising on failure"""
+        with self.lock:
+            encoded = self._encode_files(collections)
+        self._write_encoded(encoded)
+
+    def save_data(self, collections=None):
+        """Rewrite the JSON files of the given collections (all four by default)"""
+        try:
+            # For Vercel deployment, we'll use in-memory storage only
+            # Vercel has a read-only filesystem, so we can't write files
+            if os.environ.get('VERCEL'):
+                print("Running on Vercel - using in-memory storage only")
+                return
+
+            # Only try to save files if not on Vercel
+            self.write_files(collections)
+
+        except Exception as e:
+            print(f"Error saving data: {e}")
+            # Continue with in-memory storage
+
+    def record_change(self, op, data):
+        """Persist a single change that has already been applied in memory"""
+        self.record_changes([(op, data)])
+
+    def record_changes(self, records: list):
+        """Persist (op, data) changes already applied in memory, as one write"""
+        if self.write_behind:
+            with self.lock:
+                self.dirty.update(OP_COLLECTIONS[op] for op, _ in records)
+                if self.mode == 'journal':
+                    self.pending_records.extend(records)
+            self.write_behind.notify()
+            return
+
+        if self.mode != 'journal':
+            self.save_data({OP_COLLECTIONS[op] for op, _ in records})
+            return
+
+        if os.environ.get('VERCEL'):
+            return
+
+        try:
+            self.journal.append_many(records)
+            if self.journal.needs_compaction():
+                self.compact_journal()
+        except Exception as e:
+            print(f"Error writing journal: {e}")
+
+    def _encode_snapshot(self):
+        """Everything a compaction writes, encoded while the data can't change"""
+        if self.snapshot_format == 'binary':
+            return encode_snapshot(self.users, list(self.transactions), self.budgets, self.goals)
+        return self._encode_files()
+
+    def _write_snapshot(self, encoded):
+        """Write an encoded snapshot, then drop the journal records it contains"""
+        if self.snapshot_format == 'binary':
+            write_sections(self.snapshot_file, encoded)
+            with self.lock:
+                self.stale_files = set(self._collection_files())
+        else:
+            self._write_encoded(encoded)
+        self.journal.truncate()
+
+    def compact_journal(self):
+        """Fold the journal into a fresh snapshot of the data
+
+        Raises if the snapshot can't be written, leaving the journal in place.
+        """
+        with self.lock:
+            encoded = self._encode_snapshot()
+        self._write_snapshot(encoded)
+
+    def flush(self):
+        """Write every change marked since the last flush as one commit
+
+        The changes are encoded under the lock and written outside it, so
+        requests only wait for the encoding, never for the disk.
+        """
+        with self.flush_lock:
+            with self.lock:
+                dirty, self.dirty = self.dirty, set()
+                records, self.pending_records = self.pending_records, []
+                if not dirty or os.environ.get('VERCEL'):
+                    return
+                encoded = snapshot = None
+                if self.mode != 'journal':
+                    encoded = self._encode_files(dirty)
+                elif self.journal.size + len(records) >= self.journal.compact_every:
+                    snapshot = self._encode_snapshot()
+
+            try:
+                if self.mode != 'journal':
+                    self._write_encoded(encoded)
+                else:
+                    self.journal.append_many(records)
+            except Exception:
+                # Keep the changes so the next flush retries them - replay
+                # skips any records that did make it to disk
+                with self.lock:
+                    self.dirty |= dirty
+                    self.pending_records[:0] = records
+                raise
+
+            # The records are journaled, so a failed snapshot only delays compaction
+            if snapshot is not None:
+                self._write_snapshot(snapshot)
+
+    def close(self):
+        """Stop the background flusher, writing out anything still pending"""
+        if self.write_behind:
+            self.write_behind.stop()
+
+    def stats(self) -> dict:
+        """Row counts and backend details for the debug endpoint"""
+        return {
+            'backend': 'json',
+            'mode': self.mode,
+            'users': len(self.users),
+            'transactions': len(self.transactions),
+            'budgets': len(self.budgets),
+            'goals': len(self.goals),
+            'files_exist': {
+                'users': os.path.exists(self.users_file),
+                'transactions': os.path.exists(self.transactions_file),
+                'budgets': os.path.exists(self.budgets_file),
+                'goals': os.path.exists(self.goals_file),
+                'snapshot': os.path.exists(self.snapshot_file)
+            }
+        }
+
+    # Users
+
+    def list_user_ids(self):
+        return [user.get('id') for user in self.users.values()]
+
+    def get_user_by_username(self, username: str):
+        return self.users.get(username)
+
+    def get_user_by_id(self, user_id: str):
+        return self.user_index.by_id.get(user_id)
+
+    def get_user_by_email(self, email: str):
+        return self.user_index.by_email.get(email)
+
+    def get_user_by_reset_token(self, token: str):
+        return self.user_index.by_reset_token.get(token)
+
+    def get_data_version(self, user_id: str) -> str:
+        """Opaque token that changes whenever the user's data does"""
+        return f'{self.instance}.{self.versions.get(user_id, 0)}'
+
+    def _bump_version(self, user_id: str):
+        self.versions[user_id] = self.versions.get(user_id, 0) + 1
+
+    def save_user(self, user: dict):
+        """Insert a new user or persist changes made to an existing one"""
+        with self.lock:
+            self.users[user['username']] = user
+            self.user_index.add(user)
+            self._bump_version(user.get('id'))
+            self.record_change('put_user', user)
+
+    def purge_expired_reset_tokens(self, now: datetime = None) -> int:
+        """Drop reset tokens past their expiry, persisting only the users that held one"""
+        with self.lock:
+            expired = self.user_index.pop_expired(now or datetime.now())
+            for user in expired:
+                user.pop('reset_token', None)
+                user.pop('reset_expires', None)
+                self.user_index.add(user)
+                self._bump_version(user.get('id'))
+            if expired:
+                self.record_changes([('put_user', user) for user in expired])
+        return len(expired)
+
+    # Transactions
+
+    def get_user_transactions(self, user_id: str):
+        """The user's transactions, oldest date first"""
+        return self.user_transactions.get(user_id)
+
+    def get_user_transactions_between(self, user_id: str, start: str = None, end: str = None):
+        """The user's transactions dated start..end (ISO dates, inclusive; None is open-ended)"""
+        if self.columnar:
+            return self.user_transactions.between(user_id, start and day_ordinal(start), end and day_ordinal(end))
+        records = self.user_transactions.get(user_id)
+        lo, hi = self._date_bounds(records, start, end)
+        return records[lo:hi]
+
+    @staticmethod
+    def _date_bounds(records, start, end):
+        lo = 0 if start is None else bisect.bisect_left(records, start, key=transaction_date_key)
+        hi = len(records) if end is None else bisect.bisect_left(records, day_after(end), key=transaction_date_key)
+        return lo, hi
+
+    def iter_user_transactions(self, user_id: str, start: str = None, end: str = None, category: str = None):
+        """Yield the user's transactions oldest first, filtered, without copying the list"""
+        if self.columnar:
+            rows = self.user_transactions.iter_between(user_id, start and day_ordinal(start), end and day_ordinal(end))
+        else:
+            records = self.user_transactions.get(user_id)
+            lo, hi = self._date_bounds(records, start, end)
+            rows = (records[i] for i in range(lo, hi))
+        for transaction in rows:
+            if category is None or transaction.get('category') == category:
+                yield transaction
+
+    def get_transactions_page(self, user_id: str, limit: int, cursor=None, category: str = None,
+                              start: str = None, end: str = None):
+        """Up to limit transactions, newest first by (date, id), plus the next page's cursor"""
+        rows = newest_first(self.user_transactions.get(user_id), cursor, start, end)
+        if category is not None:
+            rows = (t for t in rows if t.get('category') == category)
+        return _page(list(itertools.islice(rows, limit + 1)), limit)
+
+    def get_spending_summary(self, user_id: str) -> SpendingSummary:
+        """Running spending totals - shared with the backend, so treat as read-only"""
+        return self.spending.get(user_id) or SpendingSummary()
+
+    def _add_transaction(self, transaction: dict):
+        if not self.columnar:
+            self.transactions.append(transaction)
+        self.user_transactions.add(transaction)
+        self.spending.setdefault(transaction.get('user_id'), SpendingSummary()).add(transaction)
+
+    def add_transaction(self, transaction: dict):
+        with self.lock:
+            self._add_transaction(transaction)
+            self._bump_version(transaction.get('user_id'))
+            self.record_change('add_transaction', transaction)
+
+    def add_transactions(self, transactions: list):
+        """Add many transactions and persist them with a single write"""
+        if not transactions:
+            return
+        with self.lock:
+            for transaction in transactions:
+                self._add_transaction(transaction)
+            for user_id in {t.get('user_id') for t in transactions}:
+                self._bump_version(user_id)
+            self.record_changes([('add_transaction', t) for t in transactions])
+
+    # Budgets
+
+    def get_user_budgets(self, user_id: str):
+        return self.budgets.get(user_id, {})
+
+    def set_user_budgets(self, user_id: str, budgets: dict):
+        with self.lock:
+            self.budgets[user_id] = budgets
+            self._bump_version(user_id)
+            self.record_change('set_budget', {'user_id': user_id, 'budgets': budgets})
+
+    # Goals
+
+    def get_user_goals(self, user_id: str):
+        return self.user_goals.get(user_id)
+
+    def add_goal(self, goal: dict):
+        with self.lock:
+            self.goals.append(goal)
+            self.user_goals.add(goal)
+            self._bump_version(goal.get('user_id'))
+            self.record_change('add_goal', goal)
+
+    def update_goal_progress(self, user_id: str, goal_id: str, current_amount: float):
+        with self.lock:
+            for goal in self.user_goals.get(user_id):
+                if goal['id'] == goal_id:
+                    goal['current_amount'] = current_amount
+                    self._bump_version(user_id)
+                    self.record_change('update_goal', {'id': goal_id, 'user_id': user_id, 'current_amount': current_amount})
+                    return goal
+        return None
+
+
+class MemoryStorage(JSONStorage):
+    def __init__(self):
+        """A JSON backend that never touches the disk - data lives as long as the process"""
+        super().__init__('')
+
+    def load_data(self):
+        """Nothing to load"""
+
+    def record_changes(self, records: list):
+        """Nothing to persist"""
+
+    def stats(self) -> dict:
+        """Row counts and backend details for the debug endpoint"""
+        return {
+            'backend': 'memory',
+            'users': len(self.users),
+            'transactions': len(self.transactions),
+            'budgets': len(self.budgets),
+            'goals': len(self.goals)
+        }
+
+
+# Schema mirroring database_setup_ready.sql, plus the password and reset
+# token columns that Supabase auth keeps elsewhere
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    email TEXT UNIQUE NOT NULL,
+    username TEXT UNIQUE NOT NULL,
+    password TEXT NOT NULL,
+    income REAL DEFAULT 0,
+    reset_token TEXT,
+    reset_expires TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS transactions (
+    id TEXT PRIMARY KEY,
+    user_id TEXT REFERENCES users(id) ON DELETE CASCADE,
+    description TEXT NOT NULL,
+    amount REAL NOT NULL,
+    category TEXT NOT NULL,
+    date TEXT NOT NULL,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS budgets (
+    user_id TEXT REFERENCES users(id) ON DELETE CASCADE,
+    category TEXT NOT NULL,
+    amount REAL NOT NULL,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(user_id, category)
+);
+
+CREATE TABLE IF NOT EXISTS goals (
+    id TEXT PRIMARY KEY,
+    user_id TEXT REFERENCES users(id) ON DELETE CASCADE,
+    title TEXT NOT NULL,
+    target_amount REAL NOT NULL,
+    current_amount REAL DEFAULT 0,
+    deadline TEXT,
+    category TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Bumped in the same transaction as every change to a user's data
+CREATE TABLE IF NOT EXISTS data_versions (
+    user_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_transactions_user_id ON transactions(user_id, date);
+CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(date);
+CREATE INDEX IF NOT EXISTS idx_budgets_user_id ON budgets(user_id);
+CREATE INDEX IF NOT EXISTS idx_goals_user_id ON goals(user_id);
+CREATE INDEX IF NOT EXISTS idx_users_reset_token ON users(reset_token);
+CREATE INDEX IF NOT EXISTS idx_users_reset_expires ON users(reset_expires);
+"""
+
+USER_COLUMNS = ('id', 'email', 'username', 'password', 'income', 'reset_token', 'reset_expires')
+TRANSACTION_COLUMNS = ('id', 'user_id', 'description', 'amount', 'category', 'date')
+GOAL_COLUMNS = ('id', 'user_id', 'title', 'target_amount', 'current_amount', 'deadline', 'category')
+
+
+class SQLiteStorage:
+    def __init__(self, path: str):
+        """Create a SQLite backend stored at path"""
+        self.path = path
+        self._connections = ThreadConnections(path, row_factory=sqlite3.Row)
+        with self._connect() as conn:
+            conn.executescript(SQLITE_SCHEMA)
+
+    def _connect(self):
+        return self._connections.get()
+
+    def _query_one(self, sql, params=()):
+        row = self._connect().execute(sql, params).fetchone()
+        return dict(row) if row else None
+
+    def _query_all(self, sql, params=()):
+        return [dict(row) for row in self._connect().execute(sql, params)]
+
+    @staticmethod
+    def _bump_version(conn, user_id):
+        conn.execute('INSERT INTO data_versions (user_id, version) VALUES (?, 1) '
+                     'ON CONFLICT(user_id) DO UPDATE SET version = version + 1', (user_id,))
+
+    @staticmethod
+    def _user(row):
+        # Match the JSON backend, where reset fields only exist while a reset is pending
+        if row is not None:
+            for key in ('reset_token', 'reset_expires'):
+                if row.get(key) is None:
+                    row.pop(key, None)
+        return row
+
+    def load_data(self):
+        """Nothing to preload - every query goes to the database"""
+
+    def import_data(self, users: dict, transactions: list, budgets: dict, goals: list):
+        """Bulk-load data in the JSON file layout, e.g. when migrating from JSONStorage
+
+        Raises ValueError, importing nothing, if several users share an email or
+        id - the JSON backend never rejected duplicate emails, and keeping one
+        of them would orphan the others' data.
+        """
+        conflicts = []
+        for column in ('email', 'id'):
+            counts = Counter(u.get(column) for u in users.values())
+            conflicts += [f"{column} {value!r} ({count} users)" for value, count in counts.items() if count > 1]
+        if conflicts:
+            raise ValueError("Can't import users with duplicate values, resolve these first: " + ', '.join(conflicts))
+
+        with self._connect() as conn:
+            conn.executemany(
+                'INSERT INTO users (id, email, username, password, income, reset_token, reset_expires) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [tuple(u.get(c) for c in USER_COLUMNS) for u in users.values()])
+            conn.executemany(
+                'INSERT OR IGNORE INTO transactions (id, user_id, description, amount, category, date) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [tuple(t.get(c) for c in TRANSACTION_COLUMNS) for t in transactions])
+            conn.executemany(
+                'INSERT OR REPLACE INTO budgets (user_id, category, amount) VALUES (?, ?, ?)',
+                [(user_id, category, amount)
+                 for user_id, user_budgets in budgets.items()
+                 for category, amount in user_budgets.items()])
+            conn.executemany(
+                'INSERT OR IGNORE INTO goals (id, user_id, title, target_amount, current_amount, deadline, category) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [tuple(g.get(c) for c in GOAL_COLUMNS) for g in goals])
+
+    def is_empty(self) -> bool:
+        return self._query_one('SELECT 1 AS found FROM users LIMIT 1') is None
+
+    def stats(self) -> dict:
+        """Row counts and backend details for the debug endpoint"""
+        conn = self._connect()
+        counts = {
+            table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+            for table in ('users', 'transactions', 'goals')
+        }
+        counts['budgets'] = conn.execute('SELECT COUNT(DISTINCT user_id) FROM budgets').fetchone()[0]
+        return {'backend': 'sqlite', 'path': self.path, **counts}
+
+    # Users
+
+    def list_user_ids(self):
+        return [row['id'] for row in self._query_all('SELECT id FROM users')]
+
+    def get_user_by_username(self, username: str):
+        return self._user(self._query_one('SELECT * FROM users WHERE username = ?', (username,)))
+
+    def get_user_by_id(self, user_id: str):
+        return self._user(self._query_one('SELECT * FROM users WHERE id = ?', (user_id,)))
+
+    def get_user_by_email(self, email: str):
+        return self._user(self._query_one('SELECT * FROM users WHERE email = ?', (email,)))
+
+    def get_user_by_reset_token(self, token: str):
+        return self._user(self._query_one('SELECT * FROM users WHERE reset_token = ?', (token,)))
+
+    def get_data_version(self, user_id: str) -> str:
+        """Counter that changes whenever the user's data does, in any worker"""
+        row = self._query_one('SELECT version FROM data_versions WHERE user_id = ?', (user_id,))
+        return str(row['version'] if row else 0)
+
+    def save_user(self, user: dict):
+        """Insert a new user or persist changes made to an existing one"""
+        with self._connect() as conn:
+            self._bump_version(conn, user.get('id'))
+            conn.execute(
+                'INSERT INTO users (id, email, username, password, income, reset_token, reset_expires) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(id) DO UPDATE SET email = excluded.email, username = excluded.username, '
+                'password = excluded.password, income = excluded.income, reset_token = excluded.reset_token, '
+                'reset_expires = excluded.reset_expires, updated_at = CURRENT_TIMESTAMP',
+                tuple(user.get(c) for c in USER_COLUMNS))
+
+    def purge_expired_reset_tokens(self, now: datetime = None) -> int:
+        """Drop reset tokens past their expiry, found through the reset_expires index"""
+        now = (now or datetime.now()).isoformat()
+        with self._connect() as conn:
+            expired = [row[0] for row in conn.execute('SELECT id FROM users WHERE reset_expires < ?', (now,))]
+            for user_id in expired:
+                self._bump_version(conn, user_id)
+            conn.execute('UPDATE users SET reset_token = NULL, reset_expires = NULL WHERE reset_expires < ?', (now,))
+        return len(expired)
+
+    # Transactions
+
+    def get_user_transactions(self, user_id: str):
+        """The user's transactions, oldest date first"""
+        return self._query_all(
+            'SELECT id, user_id, description, amount, category, date FROM transactions '
+            'WHERE user_id = ? ORDER BY date, rowid', (user_id,))
+
+    def get_user_transactions_between(self, user_id: str, start: str = None, end: str = None):
+        """The user's transactions dated start..end (ISO dates, inclusive; None is open-ended)"""
+        # Plain comparisons on date keep the (user_id, date) index usable
+        return self._query_all(
+            'SELECT id, user_id, description, amount, category, date FROM transactions '
+            'WHERE user_id = ? AND date >= ? AND date < ? ORDER BY date, rowid',
+            (user_id, start or '', day_after(end) if end else '\uffff'))
+
+    def iter_user_transactions(self, user_id: str, start: str = None, end: str = None, category: str = None):
+        """Yield the user's transactions oldest first, filtered, straight off the cursor"""
+        sql = ('SELECT id, user_id, description, amount, category, date FROM transactions '
+               'WHERE user_id = ? AND date >= ? AND date < ?')
+        params = [user_id, start or '', day_after(end) if end else '\uffff']
+        if category is not None:
+            sql += ' AND category = ?'
+            params.append(category)
+        for row in self._connect().execute(sql + ' ORDER BY date, rowid', params):
+            yield dict(row)
+
+    def get_transactions_page(self, user_id: str, limit: int, cursor=None, category: str = None,
+                              start: str = None, end: str = None):
+        """Up to limit transactions, newest first by (date, id), plus the next page's cursor"""
+        sql = 'SELECT id, user_id, description, amount, category, date FROM transactions WHERE user_id = ?'
+        params = [user_id]
+        if cursor is not None:
+            sql += ' AND (date < ? OR (date = ? AND id < ?))'
+            params += [cursor[0], cursor[0], cursor[1]]
+        if category is not None:
+            sql += ' AND category = ?'
+            params.append(category)
+        if start:
+            sql += ' AND date >= ?'
+            params.append(start)
+        if end:
+            sql += ' AND date < ?'
+            params.append(day_after(end))
+        sql += ' ORDER BY date DESC, id DESC LIMIT ?'
+        params.append(limit + 1)
+        return _page(self._query_all(sql, params), limit)
+
+    def get_spending_summary(self, user_id: str) -> SpendingSummary:
+        """Spending totals, summed by the database per category and day"""
+        summary = SpendingSummary()
+        rows = self._connect().execute(
+            'SELECT category, substr(date, 1, 10) AS day, SUM(amount), COUNT(*) FROM transactions '
+            'WHERE user_id = ? GROUP BY category, day', (user_id,))
+        for category, day, amount, count in rows:
+            summary.add_amount(category, day, amount, count)
+        return summary
+
+    def add_transaction(self, transaction: dict):
+        with self._connect() as conn:
+            self._bump_version(conn, transaction.get('user_id'))
+            conn.execute(
+                'INSERT INTO transactions (id, user_id, description, amount, category, date) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                tuple(transaction.get(c) for c in TRANSACTION_COLUMNS))
+
+    def add_transactions(self, transactions: list):
+        """Add many transactions in a single database transaction"""
+        if not transactions:
+            return
+        with self._connect() as conn:
+            for user_id in {t.get('user_id') for t in transactions}:
+                self._bump_version(conn, user_id)
+            conn.executemany(
+                'INSERT INTO transactions (id, user_id, description, amount, category, date) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [tuple(t.get(c) for c in TRANSACTION_COLUMNS) for t in transactions])
+
+    # Budgets
+
+    def get_user_budgets(self, user_id: str):
+        rows = self._query_all('SELECT category, amount FROM budgets WHERE user_id = ?', (user_id,))
+        return {row['category']: row['amount'] for row in rows}
+
+    def set_user_budgets(self, user_id: str, budgets: dict):
+        with self._connect() as conn:
+            self._bump_version(conn, user_id)
+            conn.execute('DELETE FROM budgets WHERE user_id = ?', (user_id,))
+            conn.executemany(
+                'INSERT INTO budgets (user_id, category, amount) VALUES (?, ?, ?)',
+                [(user_id, category, amount) for category, amount in budgets.items()])
+
+    # Goals
+
+    def get_user_goals(self, user_id: str):
+        return self._query_all(
+            'SELECT id, user_id, title, target_amount, current_amount, deadline, category FROM goals '
+            'WHERE user_id = ? ORDER BY rowid', (user_id,))
+
+    def add_goal(self, goal: dict):
+        with self._connect() as conn:
+            self._bump_version(conn, goal.get('user_id'))
+            conn.execute(
+                'INSERT INTO goals (id, user_id, title, target_amount, current_amount, deadline, category) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                tuple(goal.get(c) for c in GOAL_COLUMNS))
+
+    def update_goal_progress(self, user_id: str, goal_id: str, current_amount: float):
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'UPDATE goals SET current_amount = ?, updated_at = CURRENT_TIMESTAMP '
+                'WHERE id = ? AND user_id = ?', (current_amount, goal_id, user_id))
+            if cursor.rowcount:
+                self._bump_version(conn, user_id)
+        if cursor.rowcount == 0:
+            return None
+        return self._query_one('SELECT * FROM goals WHERE id = ?', (goal_id,))
+
+
+def _postgrest_quote(value: str) -> str:
+    """A value quoted for a PostgREST filter, so commas and parentheses can't end it"""
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+class SupabaseStorage:
+    def __init__(self, client):
+        """Create a backend on a supabase-py client
+
+        The public.users table needs password, reset_token and reset_expires
+        columns on top of database_setup_ready.sql, as in SQLITE_SCHEMA.
+        """
+        self.client = client
+        self._versions = itertools.count(1)
+
+    def _table(self, name):
+        return self.client.table(name)
+
+    def get_data_version(self, user_id: str) -> str:
+        """A new value on every call - other instances write to the same tables
+        without telling us, so anything cached by version is always rebuilt"""
+        return str(next(self._versions))
+
+    def _first_user(self, result):
+        return SQLiteStorage._user(result.data[0]) if result.data else None
+
+    def load_data(self):
+        """Nothing to preload - every query goes to Supabase"""
+
+    def stats(self) -> dict:
+        """Row counts and backend details for the debug endpoint"""
+        counts = {
+            table: self._table(table).select('user_id' if table == 'budgets' else 'id', count='exact').limit(1).execute().count
+            for table in ('users', 'transactions', 'budgets', 'goals')
+        }
+        return {'backend': 'supabase', **counts}
+
+    # Users
+
+    def list_user_ids(self):
+        return [row['id'] for row in self._table('users').select('id').execute().data]
+
+    def get_user_by_username(self, username: str):
+        return self._first_user(self._table('users').select('*').eq('username', username).limit(1).execute())
+
+    def get_user_by_id(self, user_id: str):
+        return self._first_user(self._table('users').select('*').eq('id', user_id).limit(1).execute())
+
+    def get_user_by_email(self, email: str):
+        return self._first_user(self._table('users').select('*').eq('email', email).limit(1).execute())
+
+    def get_user_by_reset_token(self, token: str):
+        return self._first_user(self._table('users').select('*').eq('reset_token', token).limit(1).execute())
+
+    def save_user(self, user: dict):
+        """Insert a new user or persist changes made to an existing one"""
+        self._table('users').upsert({c: user.get(c) for c in USER_COLUMNS}).execute()
+
+    def purge_expired_reset_tokens(self, now: datetime = None) -> int:
+        """Drop reset tokens past their expiry with one filtered update"""
+        result = (self._table('users').update({'reset_token': None, 'reset_expires': None})
+                  .lt('reset_expires', (now or datetime.now()).isoformat()).execute())
+        return len(result.data or [])
+
+    # Transactions
+
+    def _transactions(self, user_id):
+        return self._table('transactions').select(','.join(TRANSACTION_COLUMNS)).eq('user_id', user_id)
+
+    def get_user_transactions(self, user_id: str):
+        """The user's transactions, oldest date first"""
+        return self._transactions(user_id).order('date').execute().data
+
+    def get_user_transactions_between(self, user_id: str, start: str = None, end: str = None):
+        """The user's transactions dated start..end (ISO dates, inclusive; None is open-ended)"""
+        query = self._transactions(user_id)
+        if start:
+            query = query.gte('date', start)
+        if end:
+            query = query.lte('date', end)
+        return query.order('date').execute().data
+
+    def iter_user_transactions(self, user_id: str, start: str = None, end: str = None, category: str = None,
+                               batch_size: int = 1000):
+        """Yield the user's transactions oldest first, filtered, fetching a batch at a time"""
+        offset = 0
+        while True:
+            query = self._transactions(user_id)
+            if start:
+                query = query.gte('date', start)
+            if end:
+                query = query.lte('date', end)
+            if category is not None:
+                query = query.eq('category', category)
+            rows = query.order('date').order('id').range(offset, offset + batch_size - 1).execute().data
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            offset += batch_size
+
+    def get_transactions_page(self, user_id: str, limit: int, cursor=None, category: str = None,
+                              start: str = None, end: str = None):
+        """Up to limit transactions, newest first by (date, id), plus the next page's cursor"""
+        query = self._transactions(user_id)
+        if cursor is not None:
+            date_key, transaction_id = (_postgrest_quote(value) for value in cursor)
+            query = query.or_(f'date.lt.{date_key},and(date.eq.{date_key},id.lt.{transaction_id})')
+        if category is not None:
+            query = query.eq('category', category)
+        if start:
+            query = query.gte('date', start)
+        if end:
+            query = query.lte('date', end)
+        rows = query.order('date', desc=True).order('id', desc=True).limit(limit + 1).execute().data
+        return _page(rows, limit)
+
+    def get_spending_summary(self, user_id: str) -> SpendingSummary:
+        """Spending totals, folded from just the columns they need"""
+        rows = self._table('transactions').select('amount,category,date').eq('user_id', user_id).execute().data
+        return SpendingSummary.from_transactions(rows)
+
+    def add_transaction(self, transaction: dict):
+        self._table('transactions').insert({c: transaction.get(c) for c in TRANSACTION_COLUMNS}).execute()
+
+    def add_transactions(self, transactions: list):
+        """Add many transactions with a single insert request"""
+        if transactions:
+            self._table('transactions').insert(
+                [{c: t.get(c) for c in TRANSACTION_COLUMNS} for t in transactions]).execute()
+
+    # Budgets
+
+    def get_user_budgets(self, user_id: str):
+        rows = self._table('budgets').select('category,amount').eq('user_id', user_id).execute().data
+        return {row['category']: row['amount'] for row in rows}
+
+    def set_user_budgets(self, user_id: str, budgets: dict):
+        self._table('budgets').delete().eq('user_id', user_id).execute()
+        rows = [{'user_id': user_id, 'category': category, 'amount': amount} for category, amount in budgets.items()]
+        if rows:
+            self._table('budgets').insert(rows).execute()
+
+    # Goals
+
+    def get_user_goals(self, user_id: str):
+        return self._table('goals').select(','.join(GOAL_COLUMNS)).eq('user_id', user_id).order('created_at').execute().data
+
+    def add_goal(self, goal: dict):
+        self._table('goals').insert({c: goal.get(c) for c in GOAL_COLUMNS}).execute()
+
+    def update_goal_progress(self, user_id: str, goal_id: str, current_amount: float):
+        result = self._table('goals').update({'current_amount': current_amount}).eq('id', goal_id).eq('user_id', user_id).execute()
+        return result.data[0] if result.data else None
+
+
+def create_storage(data_dir: str):
+    """Create the backend selected by the STORAGE_BACKEND environment variable"""
+    backend = os.environ.get('STORAGE_BACKEND', 'json')
+
+    if backend == 'memory':
+        return MemoryStorage()
+
+    if backend == 'supabase':
+        from supabase import create_client
+        return SupabaseStorage(create_client(os.environ['SUPABASE_URL'], os.environ['SUPABASE_ANON_KEY']))
+
+    if backend == 'sqlite':
+        storage = SQLiteStorage(os.environ.get('SQLITE_PATH', os.path.join(data_dir, 'budget.db')))
+        # First start on an existing deployment: carry the JSON data over
+        if storage.is_empty():
+            legacy = JSONStorage(data_dir, os.environ.get('STORAGE_MODE', 'files'))
+            legacy.load_data()
+            if legacy.users:
+                print(f"Importing {len(legacy.users)} users from JSON files into SQLite")
+                # Stops startup if users share an email, rather than silently dropping accounts
+                storage.import_data(legacy.users, legacy.transactions, legacy.budgets, legacy.goals)
+        return storage
+
+    storage = JSONStorage(data_dir,
+                          os.environ.get('STORAGE_MODE', 'files'),
+                          int(os.environ.get('JOURNAL_COMPACT_EVERY', 1000)),
+                          float(os.environ.get('WRITE_BEHIND_SECONDS', 0)),
+                          os.environ.get('SNAPSHOT_FORMAT', 'json'),
+                          os.environ.get('TRANSACTION_STORE', 'dicts'))
+    storage.load_data()
+    # Flush pending write-behind changes on a clean shutdown
+    atexit.register(storage.close)
+    return storage
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage(data_dir: str = None):
+    """The backend shared by every route in the process, created on first use"""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            _storage = create_storage(data_dir or os.environ.get('DATA_DIR', os.path.dirname(os.path.abspath(__file__))))
+    return _storage
@@ -0,0 +1,82 @@
+"""
+Dashboard chart series, read from a user's precomputed spending buckets
+"""
+from datetime import date, timedelta
+
+# Months shown on the income/expense trend chart
+TREND_MONTHS = 6
+GRANULARITIES = ('day', 'week', 'month')
+
+
+def last_months(count: int, today: date = None) -> list:
+    """The `count` months up to and including today's as (year, month), oldest first"""
+    today = today or date.today()
+    months = []
+    year, month = today.year, today.month
+    for _ in range(count):
+        months.append((year, month))
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    return months[::-1]
+
+
+def chart_series(spending, income: float, months: int = TREND_MONTHS, today: date = None) -> dict:
+    """Category and monthly income/expense series for the dashboard charts
+
+    Reads the summary's category totals and monthly buckets, so the cost is
+    O(categories + months) however long the history.
+    """
+    categories = sorted(spending.by_category.items(), key=lambda item: item[1], reverse=True)
+    trend = last_months(months, today)
+    return {
+        'category_labels': [category for category, _ in categories],
+        'category_data': [round(amount, 2) for _, amount in categories],
+        'trend_labels': [date(year, month, 1).strftime('%b %Y') for year, month in trend],
+        # Income is the user's stated monthly income
+        'income_trend': [income or 0] * len(trend),
+        'expense_trend': [round(spending.by_month.get(f'{year:04d}-{month:02d}', 0), 2) for year, month in trend]
+    }
+
+
+def _bucket_end(day: date, granularity: str) -> date:
+    """Last day of the day/week (Monday to Sunday)/month bucket holding `day`"""
+    if granularity == 'day':
+        return day
+    if granularity == 'week':
+        return day + timedelta(days=6 - day.weekday())
+    next_month = date(day.year + 1, 1, 1) if day.month == 12 else date(day.year, day.month + 1, 1)
+    return next_month - timedelta(days=1)
+
+
+def buckets(start: date, end: date, granularity: str):
+    """Yield (first day, last day) of each bucket covering start..end, clipped to the range"""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    day = start
+    while day <= end:
+        last = min(_bucket_end(day, granularity), end)
+        yield day, last
+        day = last + timedelta(days=1)
+
+
+def bucket_count(start: date, end: date, granularity: str) -> int:
+    """How many buckets buckets() would yield, without generating them"""
+    if end < start:
+        return 0
+    if granularity == 'day':
+        return (end - start).days + 1
+    if granularity == 'week':
+        return (end - timedelta(days=end.weekday()) - (start - timedelta(days=start.weekday()))).days // 7 + 1
+    return (end.year - start.year) * 12 + end.month - start.month + 1
+
+
+def spending_buckets(spending, start: date, end: date, granularity: str = 'day', category: str = None) -> list:
+    """Spending per bucket over start..end, each summed from the prefix-sum index
+
+    Every bucket is two bisects and a subtraction, so the cost follows the
+    number of buckets, not the length of the history.
+    """
+    return [
+        {'start': first.isoformat(), 'end': last.isoformat(),
+         'amount': round(spending.spent_between(first, last, category), 2)}
+        for first, last in buckets(start, end, granularity)
+    ]
@@ -0,0 +1,59 @@
+"""
+Background flusher that batches storage writes (write-behind with group commit)
+"""
+import threading
+
+# Longest wait between retries of a failing flush
+MAX_RETRY_SECONDS = 30.0
+
+
+class WriteBehind:
+    def __init__(self, flush, window: float):
+        """Call flush() at most once per `window` seconds while changes are pending"""
+        self.flush = flush
+        self.window = window
+        self._pending = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._failures = 0
+
+    def notify(self):
+        """Signal that there are changes to write; returns immediately"""
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='storage-write-behind', daemon=True)
+                    self._thread.start()
+        self._pending.set()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._pending.wait()
+            # Let the burst that woke us up keep arriving, then commit it as one write
+            self._stopping.wait(self.window)
+            self._pending.clear()
+            if self._flush():
+                self._failures = 0
+                continue
+            # The changes are still queued, so retry with a growing backoff
+            # instead of waiting for the next change to wake us up
+            self._failures += 1
+            self._stopping.wait(min(self.window * 2 ** self._failures, MAX_RETRY_SECONDS))
+            self._pending.set()
+
+    def _flush(self) -> bool:
+        try:
+            self.flush()
+            return True
+        except Exception as e:
+            print(f"Error in background flush: {e}")
+            return False
+
+    def stop(self):
+        """Stop the thread and write anything still pending"""
+        self._stopping.set()
+        self._pending.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._flush()
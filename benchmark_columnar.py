@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Benchmark memory per transaction: list of dicts vs the columnar store
+
+Usage: python benchmark_columnar.py [transaction counts...]   (default 10000 100000 1000000)
+"""
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+
+from benchmark_load import generate_data
+from columnar import ColumnarTransactions
+from indexes import UserPartitions, transaction_date_key
+
+def retained_bytes(build):
+    """Bytes still allocated after build() returns, with its result kept alive"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, result
+
+def benchmark(count):
+    _, transactions, _, _ = generate_data(count)
+    # Round-trip through JSON so the strings aren't shared, as after load_data()
+    encoded = json.dumps(transactions)
+    del transactions
+
+    def build_dicts():
+        partitions = UserPartitions(sort_key=transaction_date_key)
+        partitions.rebuild(json.loads(encoded))
+        return partitions
+
+    def build_columnar():
+        store = ColumnarTransactions()
+        store.rebuild(json.loads(encoded))
+        return store
+
+    dict_bytes, _ = retained_bytes(build_dicts)
+    columnar_bytes, _ = retained_bytes(build_columnar)
+    print(f"{count:>9,} | {dict_bytes / count:7.0f} B {columnar_bytes / count:7.0f} B {dict_bytes / columnar_bytes:5.1f}x")
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    print("🚀 Transactions in memory: list of dicts vs columnar")
+    print("=" * 45)
+    print(f"{'rows':>9} | {'dicts':>9} {'columnar':>9} {'':>5}")
+    for count in counts:
+        benchmark(count)
+    print("\nBytes are what stays allocated after loading (tracemalloc), including ids and descriptions")
+
+if __name__ == '__main__':
+    main()
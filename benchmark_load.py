@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark cold-start load time: pretty-printed JSON files vs snapshot.bin
+
+Usage: python benchmark_load.py [transaction counts...]   (default 10000 100000 1000000)
+"""
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+
+from snapshot import read_snapshot, write_snapshot
+from storage import JSONStorage
+
+CATEGORIES = ['Food', 'Transportation', 'Entertainment', 'Dining', 'Shopping', 'Rent', 'Utilities', 'Health']
+
+def generate_data(count):
+    """Synthetic data shaped like what the app writes: ~50 transactions per user"""
+    rng = random.Random(42)
+    users = {}
+    for n in range(max(1, count // 50)):
+        username = f'user{n}'
+        users[username] = {'id': str(uuid.UUID(int=rng.getrandbits(128))), 'email': f'{username}@example.com',
+                           'username': username, 'password': 'x' * 64, 'income': 4000.0}
+    user_ids = [user['id'] for user in users.values()]
+    transactions = [{
+        'id': str(uuid.UUID(int=rng.getrandbits(128))),
+        'user_id': rng.choice(user_ids),
+        'description': f'Purchase {n}',
+        'amount': round(rng.uniform(1, 300), 2),
+        'category': rng.choice(CATEGORIES),
+        'date': f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}'
+    } for n in range(count)]
+    budgets = {user_id: {category: 500.0 for category in CATEGORIES[:4]} for user_id in user_ids}
+    return users, transactions, budgets, []
+
+def timed(fn):
+    gc.collect()
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+def benchmark(count):
+    users, transactions, budgets, goals = generate_data(count)
+    with tempfile.TemporaryDirectory() as json_dir, tempfile.TemporaryDirectory() as binary_dir:
+        storage = JSONStorage(json_dir)
+        storage.users, storage.transactions, storage.budgets, storage.goals = users, transactions, budgets, goals
+        storage.save_data()
+        snapshot_path = os.path.join(binary_dir, 'snapshot.bin')
+        write_snapshot(snapshot_path, users, transactions, budgets, goals)
+        del storage, users, transactions, budgets, goals
+
+        json_size = sum(os.path.getsize(os.path.join(json_dir, name)) for name in os.listdir(json_dir))
+        binary_size = os.path.getsize(snapshot_path)
+
+        def parse_json():
+            for name in ('users', 'transactions', 'budgets', 'goals'):
+                with open(os.path.join(json_dir, f'{name}.json'), 'r', encoding='utf-8') as f:
+                    json.load(f)
+
+        parse_json_time, _ = timed(parse_json)
+        parse_binary_time, _ = timed(lambda: read_snapshot(snapshot_path))
+        load_json_time, _ = timed(lambda: JSONStorage(json_dir).load_data())
+        load_binary_time, _ = timed(lambda: JSONStorage(binary_dir).load_data())
+
+    print(f"{count:>9,} | {json_size / 1e6:8.1f} MB {binary_size / 1e6:7.1f} MB | "
+          f"{parse_json_time:7.2f}s {parse_binary_time:7.2f}s | "
+          f"{load_json_time:7.2f}s {load_binary_time:7.2f}s | {load_json_time / load_binary_time:5.1f}x")
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    print("🚀 Cold start: JSON files vs snapshot.bin")
+    print("=" * 84)
+    print(f"{'rows':>9} | {'json size':>11} {'binary':>10} | {'json parse':>8} {'binary':>7} | "
+          f"{'json load':>8} {'binary':>7} | speedup")
+    for count in counts:
+        benchmark(count)
+    print("\n'load' is JSONStorage.load_data(), including building the indexes and summaries")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark password verification at each work factor, to size login capacity
+
+Usage: python benchmark_passwords.py [seconds per setting]   (default 2)
+
+A login is one verify(). "per core" runs one thread; "pool" runs the
+hasher's default pool (one thread per CPU) from as many concurrent callers.
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+
+from passwords import PasswordHasher
+
+SETTINGS = [
+    ('pbkdf2_sha256', {'iterations': 100_000}),
+    ('pbkdf2_sha256', {'iterations': 300_000}),
+    ('pbkdf2_sha256', {'iterations': 600_000}),
+    ('pbkdf2_sha256', {'iterations': 1_200_000}),
+    ('scrypt', {'scrypt_n': 2 ** 14}),
+    ('scrypt', {'scrypt_n': 2 ** 15}),
+    ('scrypt', {'scrypt_n': 2 ** 16}),
+]
+
+def logins_per_second(hasher, stored, seconds, callers=1):
+    """Verifications per second from `callers` threads calling verify() in a loop"""
+    deadline = time.perf_counter() + seconds
+    def run():
+        done = 0
+        while time.perf_counter() < deadline:
+            hasher.verify('correct horse battery staple', stored)
+            done += 1
+        return done
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as callers_pool:
+        total = sum(callers_pool.map(lambda _: run(), range(callers)))
+    return total / (time.perf_counter() - start)
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2
+    cores = os.cpu_count() or 1
+    print(f"🔐 Password verification, {cores} CPU(s), {seconds:g}s per setting (logins/sec)")
+    print("=" * 68)
+    print(f"{'setting':<34} | {'ms/login':>9} {'per core':>9} {'pool':>9}")
+
+    for algorithm, params in SETTINGS:
+        single = PasswordHasher(algorithm, workers=1, **params)
+        stored = single.hash('correct horse battery staple')
+        per_core = logins_per_second(single, stored, seconds)
+        single.close()
+
+        pooled = PasswordHasher(algorithm, **params)
+        pool = logins_per_second(pooled, stored, seconds, callers=pooled.workers * 2)
+        pooled.close()
+
+        name = f"{algorithm} " + ", ".join(f"{k}={v:,}" for k, v in params.items())
+        print(f"{name:<34} | {1000 / per_core:9.1f} {per_core:9.1f} {pool:9.1f}")
+
+    print("\nLogin capacity of a host ~ per core x cores; pick the highest cost that still covers peak logins.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark the storage backends against each other on the queries the routes make
+
+Usage: python benchmark_storage.py [transaction count]   (default 100000)
+
+Supabase isn't included - its timings are dominated by the network round trip.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+
+from benchmark_load import generate_data
+from storage import JSONStorage, MemoryStorage, SQLiteStorage
+
+def seed_json(data_dir, users, transactions, budgets, goals):
+    storage = JSONStorage(data_dir)
+    storage.users, storage.transactions, storage.budgets, storage.goals = users, transactions, budgets, goals
+    storage.save_data()
+
+def per_call(fn, args):
+    start = time.perf_counter()
+    for arg in args:
+        fn(arg)
+    return (time.perf_counter() - start) / len(args) * 1e6
+
+def benchmark(name, storage, users, samples=500):
+    rng = random.Random(7)
+    picked = rng.sample(list(users.values()), min(samples, len(users)))
+    emails = [user['email'] for user in picked]
+    user_ids = [user['id'] for user in picked]
+
+    timings = [
+        per_call(storage.get_user_by_email, emails),
+        per_call(lambda user_id: list(storage.get_user_transactions(user_id)), user_ids),
+        per_call(lambda user_id: list(storage.get_user_transactions_between(user_id, '2024-06-01', '2024-06-30')), user_ids),
+        per_call(storage.get_spending_summary, user_ids),
+        per_call(storage.get_user_budgets, user_ids),
+    ]
+    print(f"{name:<16} | " + " ".join(f"{t:9.1f}" for t in timings))
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    users, transactions, budgets, goals = generate_data(count)
+    print(f"🚀 Storage backends, {count:,} transactions / {len(users):,} users (µs per call)")
+    print("=" * 74)
+    print(f"{'backend':<16} | {'by email':>9} {'all txns':>9} {'one month':>9} {'summary':>9} {'budgets':>9}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        seed_json(tmp, users, transactions, budgets, goals)
+        for name, store in (('json (dicts)', 'dicts'), ('json (columnar)', 'columnar')):
+            storage = JSONStorage(tmp, transaction_store=store)
+            storage.load_data()
+            benchmark(name, storage, users)
+
+        memory = MemoryStorage()
+        for user in users.values():
+            memory.save_user(user)
+        for transaction in transactions:
+            memory.add_transaction(transaction)
+        for user_id, user_budgets in budgets.items():
+            memory.set_user_budgets(user_id, user_budgets)
+        benchmark('memory', memory, users)
+
+        sqlite = SQLiteStorage(os.path.join(tmp, 'budget.db'))
+        sqlite.import_data(users, transactions, budgets, goals)
+        benchmark('sqlite', sqlite, users)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Test the incrementally maintained spending aggregates
+"""
+import os
+import sys
+import threading
+from datetime import date
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+
+import aggregates
+from aggregates import DailyTotals, SpendingSummary
+
+def test_spending_summary():
+    """Test totals, category sums and day buckets"""
+    print("📈 Testing Spending Summary")
+    print("=" * 40)
+    
+    transactions = [
+        {'amount': 10.0, 'category': 'Food', 'date': '2024-01-10'},
+        {'amount': 5.0, 'category': 'Food', 'date': '2024-01-12'},
+        {'amount': 40.0, 'category': 'Rent', 'date': '2024-01-03'},
+        {'amount': 2.5, 'date': '2024-01-12T08:30:00'},
+    ]
+    summary = SpendingSummary.from_transactions(transactions)
+    
+    # Test 1: Running totals
+    assert summary.total == 57.5
+    assert summary.count == 4
+    assert summary.average == 57.5 / 4
+    print("✅ Total, count and average")
+    
+    # Test 2: Category sums and top category
+    assert summary.by_category == {'Food': 15.0, 'Rent': 40.0, 'Other': 2.5}
+    assert summary.top_category() == ('Rent', 40.0)
+    assert SpendingSummary().top_category() == (None, 0)
+    print("✅ Category sums")
+    
+    # Test 3: Day buckets and recent windows
+    assert summary.by_day['2024-01-12'] == 7.5
+    assert summary.spent_in_last_days(7, today=date(2024, 1, 12)) == 17.5
+    assert summary.spent_in_last_days(1, today=date(2024, 1, 11)) == 0
+    print("✅ Day buckets")
+    
+    # Test 4: Arbitrary ranges, before and after back-dated additions
+    assert summary.spent_between(date(2024, 1, 1), date(2024, 1, 31)) == 57.5
+    assert summary.spent_between(date(2024, 1, 4), date(2024, 1, 10)) == 10.0
+    assert summary.spent_between(date(2024, 2, 1), date(2024, 2, 29)) == 0
+    summary.add({'amount': 1.0, 'category': 'Food', 'date': '2024-01-12'})
+    summary.add({'amount': 4.0, 'category': 'Food', 'date': '2024-01-20'})
+    assert summary.spent_between(date(2024, 1, 12), date(2024, 1, 20)) == 12.5
+    summary.add({'amount': 3.0, 'category': 'Food', 'date': '2024-01-05'})
+    assert summary.spent_between(date(2024, 1, 4), date(2024, 1, 10)) == 13.0
+    assert summary.spent_between(date(2024, 1, 1), date(2024, 1, 31)) == 65.5
+    print("✅ Date ranges from running totals")
+    
+    # Test 5: Ranges within one category
+    assert summary.spent_between(date(2024, 1, 1), date(2024, 1, 31), 'Food') == 23.0
+    assert summary.spent_between(date(2024, 1, 4), date(2024, 1, 10), 'Food') == 13.0
+    assert summary.spent_between(date(2024, 1, 1), date(2024, 1, 31), 'Travel') == 0
+    print("✅ Date ranges per category")
+    
+    print("\n🎉 Spending summary tests passed!")
+
+def test_add_during_rebuild():
+    """Test an add racing a range query's index rebuild waits for it and is counted"""
+    daily = DailyTotals()
+    for day in ('2024-01-05', '2024-01-01', '2024-01-03'):
+        daily.add(day, 5.0)
+    
+    day_ordinal = aggregates.day_ordinal
+    writers = []
+    def switch_to_writer(day):
+        # Part way through the rebuild, let writers add to a summed day and a new one
+        if not writers:
+            for args in (('2024-01-01', 100.0), ('2024-01-09', 1.0)):
+                writer = threading.Thread(target=daily.add, args=args)
+                writers.append(writer)
+                writer.start()
+                writer.join(timeout=0.2)
+        return day_ordinal(day)
+    aggregates.day_ordinal = switch_to_writer
+    try:
+        assert daily.between(date(2024, 1, 1), date(2024, 1, 31)) == 15.0
+    finally:
+        aggregates.day_ordinal = day_ordinal
+    for writer in writers:
+        writer.join()
+    assert daily.between(date(2024, 1, 1), date(2024, 1, 31)) == sum(daily.by_day.values()) == 116.0
+    print("✅ Adds during an index rebuild are never lost")
+
+if __name__ == "__main__":
+    test_spending_summary()
+    test_add_during_rebuild()
@@ -0,0 +1,64 @@
+"""
+Test the cached per-user analytics snapshot
+"""
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+
+from analytics import AnalyticsCache
+from storage import MemoryStorage
+
+def test_analytics_cache():
+    """Test snapshot values, cache hits and invalidation on every kind of change"""
+    print("🧠 Testing Analytics Cache")
+    print("=" * 40)
+    
+    storage = MemoryStorage()
+    storage.save_user({'id': 'u1', 'email': 'a@example.com', 'username': 'alice', 'password': 'x', 'income': 1000.0})
+    storage.add_transaction({'id': 't1', 'user_id': 'u1', 'description': 'Lunch', 'amount': 150.0, 'category': 'Food', 'date': '2024-01-02'})
+    storage.add_transaction({'id': 't2', 'user_id': 'u1', 'description': 'Rent', 'amount': 650.0, 'category': 'Rent', 'date': '2024-01-03'})
+    storage.set_user_budgets('u1', {'Food': 100.0})
+    storage.add_goal({'id': 'g1', 'user_id': 'u1', 'title': 'Trip', 'target_amount': 500.0, 'current_amount': 100.0})
+    cache = AnalyticsCache(storage, max_users=2)
+    
+    # Test 1: Snapshot values
+    snapshot = cache.get('u1')
+    assert (snapshot.total_spent, snapshot.transaction_count) == (800.0, 2)
+    assert snapshot.savings_rate == 20.0 and snapshot.spending_ratio == 80.0
+    assert (snapshot.top_category, snapshot.top_percentage) == ('Rent', 81.25)
+    assert snapshot.budget_efficiency == [{'category': 'Food', 'spent': 150.0, 'budgeted': 100.0, 'efficiency': 150.0, 'status': 'over'}]
+    assert snapshot.overall_progress == 20.0
+    print("✅ Totals, rates, budget efficiency and goal progress")
+    
+    # Test 2: Unchanged data is a cache hit
+    assert cache.get('u1') is snapshot
+    storage.add_transaction({'id': 't3', 'user_id': 'u2', 'description': 'Bus', 'amount': 3.0, 'category': 'Transport', 'date': '2024-01-03'})
+    assert cache.get('u1') is snapshot
+    print("✅ Repeat reads and other users' changes hit the cache")
+    
+    # Test 3: Every kind of change invalidates
+    changes = [
+        lambda: storage.add_transaction({'id': 't4', 'user_id': 'u1', 'description': 'Tea', 'amount': 2.0, 'category': 'Food', 'date': '2024-01-04'}),
+        lambda: storage.set_user_budgets('u1', {'Food': 200.0}),
+        lambda: storage.add_goal({'id': 'g2', 'user_id': 'u1', 'title': 'Car', 'target_amount': 100.0, 'current_amount': 0}),
+        lambda: storage.update_goal_progress('u1', 'g1', 200.0),
+        lambda: storage.save_user(dict(storage.get_user_by_id('u1'), income=2000.0)),
+    ]
+    for change in changes:
+        before = cache.get('u1')
+        change()
+        assert cache.get('u1') is not before
+    assert cache.get('u1').income == 2000.0
+    print("✅ Transactions, budgets, goals and profile changes invalidate")
+    
+    # Test 4: Least recently used users are evicted
+    cache.get('u2')
+    cache.get('u3')
+    assert list(cache._snapshots) == ['u2', 'u3']
+    print("✅ LRU bound")
+    
+    print("\n🎉 Analytics cache tests passed!")
+
+if __name__ == "__main__":
+    test_analytics_cache()
@@ -0,0 +1,52 @@
+"""
+Test the columnar transaction store
+"""
+import os
+import sys
+from datetime import date
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+
+from columnar import ColumnarTransactions
+
+def test_columnar_transactions():
+    """Test rows read back unchanged, in date order and by date range"""
+    print("🧱 Testing Columnar Transactions")
+    print("=" * 40)
+
+    transactions = [
+        {'id': 't1', 'user_id': 'u1', 'description': 'Lunch', 'amount': 12.5, 'category': 'Food', 'date': '2024-01-12'},
+        {'id': 't2', 'user_id': 'u1', 'description': 'Rent', 'amount': 800.0, 'category': 'Rent', 'date': '2024-01-01'},
+        {'id': 't3', 'user_id': 'u2', 'description': 'Bus', 'amount': 3.0, 'category': 'Transport', 'date': '2024-01-05'},
+        {'id': 't4', 'user_id': 'u1', 'description': 'Coffee', 'amount': 4, 'category': 'Food', 'date': '2024-01-12T08:30:00', 'note': 'x'},
+    ]
+    store = ColumnarTransactions()
+    store.rebuild(transactions)
+
+    # Test 1: Rows come back as the original dicts, oldest date first
+    rows = store.get('u1')
+    assert len(rows) == 3 and len(store) == 4
+    assert [t['id'] for t in rows] == ['t2', 't1', 't4']
+    assert rows[0] == transactions[1]
+    assert rows[-1] == transactions[3]
+    assert rows[-2:] == [transactions[0], transactions[3]]
+    assert len(store.get('nobody')) == 0 and not store.get('nobody')
+    print("✅ Rows read back unchanged in date order")
+
+    # Test 2: Inserts land after earlier rows on the same day
+    store.add({'id': 't5', 'user_id': 'u1', 'description': 'Snack', 'amount': 2.0, 'category': 'Food', 'date': '2024-01-12'})
+    assert [t['id'] for t in store.get('u1')] == ['t2', 't1', 't4', 't5']
+    assert sorted(t['id'] for t in store) == ['t1', 't2', 't3', 't4', 't5']
+    print("✅ Inserts keep date order")
+
+    # Test 3: Date ranges are bisected on the packed day column
+    jan_12 = date(2024, 1, 12).toordinal()
+    assert [t['id'] for t in store.between('u1', jan_12, jan_12)] == ['t1', 't4', 't5']
+    assert [t['id'] for t in store.iter_between('u1', end_day=jan_12 - 1)] == ['t2']
+    assert store.between('nobody', jan_12) == []
+    print("✅ Date range reads")
+
+    print("\n🎉 Columnar transaction tests passed!")
+
+if __name__ == "__main__":
+    test_columnar_transactions()
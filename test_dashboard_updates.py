@@ -0,0 +1,84 @@
+"""
+Test the dashboard's delta endpoint sends only what changed since the client's version
+"""
+import os
+import re
+import sys
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+os.environ.setdefault('RATE_LIMIT_BACKEND', 'off')
+
+from api import app as budget_app
+from storage import SQLiteStorage
+
+def use_storage(storage):
+    """Point the app (and its caches) at another backend, returning the one it used"""
+    previous = budget_app.storage
+    budget_app.storage = budget_app.analytics.storage = budget_app.resolved_users.storage = storage
+    return previous
+
+def test_dashboard_updates():
+    """Test /api/dashboard answers from the data version and sends only new transactions"""
+    print("🔄 Testing dashboard updates")
+    print("=" * 40)
+    check_dashboard_updates('delta@example.com')
+
+def test_dashboard_updates_sqlite():
+    """Test the same on SQLite, whose versions come from a table"""
+    with tempfile.TemporaryDirectory() as tmp:
+        previous = use_storage(SQLiteStorage(os.path.join(tmp, 'budget.db')))
+        try:
+            check_dashboard_updates('delta-sqlite@example.com')
+        finally:
+            use_storage(previous)
+
+def check_dashboard_updates(email):
+    client = budget_app.app.test_client()
+    client.post('/register', data=dict(username=email, email=email, password='pw', income='1000'))
+    client.post('/login', data=dict(email=email, password='pw'))
+    page = client.get('/dashboard').get_data(as_text=True)
+    version = re.search(r'let version = "(.*?)";', page).group(1)
+
+    storage = budget_app.storage
+    reads = []
+    get_spending_summary = storage.get_spending_summary
+    storage.get_spending_summary = lambda user_id: (reads.append(user_id), get_spending_summary(user_id))[1]
+    try:
+        assert client.get(f'/api/dashboard?since={version}').get_json() == {'version': version, 'changed': False}
+        assert reads == []
+        print("✅ An unchanged version is answered without reading any data")
+    finally:
+        storage.get_spending_summary = get_spending_summary
+
+    for i, day in enumerate(['2024-01-01', '2024-01-02']):
+        client.post('/add_transaction', data=dict(description=f'Lunch {i}', amount='10', category='Food', date=day))
+    update = client.get(f'/api/dashboard?since={version}').get_json()
+    assert update['changed'] and update['version'] != version
+    assert [t['description'] for t in update['transactions']] == ['Lunch 1', 'Lunch 0']
+    assert update['totals']['total_spent'] == 20.0
+    assert (update['charts']['category_labels'], update['charts']['category_data']) == (['Food'], [20.0])
+    print("✅ Changes come back with totals and the chart series")
+
+    client.post('/add_transaction', data=dict(description='Bus', amount='3', category='Transport', date='2024-01-03'))
+    update = client.get('/api/dashboard', query_string={'since': update['version'], 'after': update['latest']}).get_json()
+    assert [t['description'] for t in update['transactions']] == ['Bus']
+    assert update['charts']['category_labels'] == ['Food', 'Transport']
+    print("✅ Only transactions newer than the client's latest are sent")
+
+    assert client.get('/api/dashboard?after=nonsense').status_code == 400
+    for crafted in (['2024-01-01,id.gt.0', 'x'], ['2024-01-01', 'x),user_id.neq.(y'], ['2024-01-01', 7]):
+        token = budget_app.encode_cursor(crafted)
+        assert client.get('/api/dashboard', query_string={'after': token}).status_code == 400
+        assert client.get('/api/transactions', query_string={'cursor': token}).status_code == 400
+    assert budget_app.decode_cursor(update['latest'])[0] == '2024-01-03'
+    client.get('/logout')
+    assert client.get('/api/dashboard').status_code == 401
+    print("✅ Bad cursors and logged-out requests are rejected")
+
+    print("\n🎉 Dashboard update tests passed!")
+
+if __name__ == "__main__":
+    test_dashboard_updates()
+    test_dashboard_updates_sqlite()
@@ -0,0 +1,54 @@
+"""
+Test conditional GETs answer 304 from the data version without touching the data
+"""
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+os.environ.setdefault('RATE_LIMIT_BACKEND', 'off')
+
+from api import app as budget_app
+
+def test_etag():
+    """Test pages carry an ETag that only changes with the user's data"""
+    print("🏷️ Testing ETag revalidation")
+    print("=" * 40)
+
+    client = budget_app.app.test_client()
+    client.post('/register', data=dict(username='etag', email='etag@example.com', password='pw', income='1000'))
+    client.post('/login', data=dict(email='etag@example.com', password='pw'))
+    client.get('/dashboard')  # shows the login flash, which is never cached
+
+    response = client.get('/spending_analysis')
+    etag = response.headers['ETag']
+    assert response.status_code == 200 and response.headers['Cache-Control'] == 'private, no-cache'
+    print("✅ Pages are sent with an ETag")
+
+    storage = budget_app.storage
+    reads = []
+    get_spending_summary = storage.get_spending_summary
+    storage.get_spending_summary = lambda user_id: (reads.append(user_id), get_spending_summary(user_id))[1]
+    try:
+        for path in ('/spending_analysis', '/ai-analysis', '/api/transactions'):
+            response = client.get(path, headers={'If-None-Match': etag})
+            assert response.status_code == 304 and not response.data
+        assert reads == []
+        print("✅ Unchanged data answers 304 without aggregating anything")
+    finally:
+        storage.get_spending_summary = get_spending_summary
+
+    client.post('/add_transaction', data=dict(description='Lunch', amount='12', category='Food', date='2024-01-02'))
+    client.get('/dashboard')
+    response = client.get('/spending_analysis', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['ETag'] != etag
+    print("✅ A new transaction changes the ETag")
+
+    client.get('/logout')
+    assert client.get('/spending_analysis', headers={'If-None-Match': etag}).status_code == 302
+    print("✅ Logged-out requests are never answered from the ETag")
+
+    print("\n🎉 ETag tests passed!")
+
+if __name__ == "__main__":
+    test_etag()
@@ -0,0 +1,81 @@
+"""
+Test the per-user event broker and the /api/stream feed built on it
+"""
+import os
+import queue
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+os.environ.setdefault('RATE_LIMIT_BACKEND', 'off')
+
+from events import CLOSED, EventBroker
+
+def test_broker():
+    """Test events reach only the user's subscribers, through bounded queues"""
+    print("📡 Testing the event broker")
+    print("=" * 40)
+
+    broker = EventBroker(max_queued=3, max_subscribers=2)
+    first = broker.subscribe('u1')
+    second = broker.subscribe('u1')
+    other = broker.subscribe('u2')
+    assert broker.publish('u1', {'version': 1}) == 2
+    assert first.get(timeout=0) == second.get(timeout=0) == {'version': 1}
+    try:
+        other.get(timeout=0)
+        assert False, "u2 received u1's event"
+    except queue.Empty:
+        pass
+    print("✅ Events go to every stream of the user and nobody else")
+
+    for version in range(2, 10):
+        broker.publish('u1', {'version': version})
+    assert [first.get(timeout=0)['version'] for _ in range(3)] == [7, 8, 9]
+    print("✅ A slow reader keeps only the newest events")
+
+    third = broker.subscribe('u1')
+    assert broker.subscriber_count('u1') == 2
+    while first.get(timeout=0) is not CLOSED:
+        pass
+    print("✅ Opening too many streams closes the oldest")
+
+    second.close()
+    third.close()
+    other.close()
+    assert broker.subscriber_count() == 0 and broker.publish('u1', {}) == 0
+    print("✅ Closed streams are unsubscribed")
+
+def test_stream():
+    """Test /api/stream sends the current version, then a change event per update"""
+    from api import app as budget_app
+
+    client = budget_app.app.test_client()
+    client.post('/register', data=dict(username='stream', email='stream@example.com', password='pw', income='1000'))
+    client.post('/login', data=dict(email='stream@example.com', password='pw'))
+
+    response = client.get('/api/stream', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+    assert next(chunks).startswith(b'retry:')
+    assert next(chunks).startswith(b'event: version\n')
+
+    client.post('/add_transaction', data=dict(description='Lunch', amount='12', category='Food', date='2024-01-02'))
+    assert next(chunks).startswith(b'event: change\ndata: {"kind": "transaction"')
+    response.close()
+    assert budget_app.events.subscriber_count() == 0
+    print("✅ /api/stream pushes a change event when a transaction is added")
+
+    budget_app.EVENT_STREAM = False
+    try:
+        assert client.get('/api/stream').status_code == 204
+        assert 'new EventSource' not in client.get('/dashboard').get_data(as_text=True)
+    finally:
+        budget_app.EVENT_STREAM = True
+    print("✅ Without streaming, /api/stream answers 204 and the dashboard only polls")
+
+    print("\n🎉 Event tests passed!")
+
+if __name__ == "__main__":
+    test_broker()
+    test_stream()
@@ -0,0 +1,62 @@
+"""
+Test the streaming CSV and JSON Lines export
+"""
+import csv
+import io
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+
+import export
+from export import stream_export
+
+def test_stream_export():
+    """Test both formats, extra collections and chunked output"""
+    print("📤 Testing Streaming Export")
+    print("=" * 40)
+    
+    transactions = [
+        {'id': 't1', 'user_id': 'u1', 'description': 'Lunch, "big"', 'amount': 12.5, 'category': 'Food', 'date': '2024-01-02'},
+        {'id': 't2', 'user_id': 'u1', 'description': 'Bus', 'amount': 3.0, 'category': 'Transport', 'date': '2024-01-03'},
+    ]
+    budgets = {'Food': 200.0}
+    goals = [{'id': 'g1', 'user_id': 'u1', 'title': 'Trip', 'target_amount': 500.0, 'current_amount': 0, 'deadline': '2024-12-31', 'category': 'Travel'}]
+    
+    # Test 1: CSV in the export_data column layout
+    rows = list(csv.reader(io.StringIO(''.join(stream_export(iter(transactions))))))
+    assert rows == [['Date', 'Description', 'Amount', 'Category'],
+                    ['2024-01-02', 'Lunch, "big"', '12.5', 'Food'],
+                    ['2024-01-03', 'Bus', '3.0', 'Transport']]
+    print("✅ CSV rows")
+    
+    # Test 2: Budgets and goals follow as their own sections
+    rows = list(csv.reader(io.StringIO(''.join(stream_export(iter(transactions), budgets=budgets, goals=goals)))))
+    assert rows[3:] == [[], ['Budget Category', 'Budget Amount'], ['Food', '200.0'],
+                        [], ['Goal', 'Target Amount', 'Current Amount', 'Deadline', 'Category'],
+                        ['Trip', '500.0', '0', '2024-12-31', 'Travel']]
+    print("✅ CSV budget and goal sections")
+    
+    # Test 3: JSON Lines tags every record with its type
+    records = [json.loads(line) for line in ''.join(stream_export(iter(transactions), 'jsonl', budgets, goals)).splitlines()]
+    assert [r['type'] for r in records] == ['transaction', 'transaction', 'budget', 'goal']
+    assert records[0]['description'] == 'Lunch, "big"' and records[2]['amount'] == 200.0
+    print("✅ JSON Lines records")
+    
+    # Test 4: The header goes out before any row is read, then rows in bounded chunks
+    consumed = []
+    def rows_read():
+        for n in range(export.CHUNK_ROWS * 2 + 1):
+            consumed.append(n)
+            yield dict(transactions[1], id=f't{n}')
+    chunks = stream_export(rows_read())
+    assert next(chunks).startswith('Date,') and consumed == []
+    sizes = [chunk.count('\n') for chunk in chunks]
+    assert sizes == [export.CHUNK_ROWS, export.CHUNK_ROWS, 1]
+    print("✅ Streams in chunks")
+    
+    print("\n🎉 Export tests passed!")
+
+if __name__ == "__main__":
+    test_stream_export()
@@ -0,0 +1,70 @@
+"""
+Test bulk transaction import parsing, validation and dedupe
+"""
+import io
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+
+from importer import load_rows, plan_import
+from storage import MemoryStorage
+
+CSV_UPLOAD = (
+    '\ufeffDate,Description,Amount,Category\r\n'
+    '2024-01-01,Coffee,3.5,Food\r\n'
+    '2024-01-01,Coffee,3.5,Food\r\n'
+    '2024-02-30,Bad date,1,Food\r\n'
+    '2024-01-02,"Rent, January",900,Rent\r\n'
+    '2024-01-03,No amount,,Food\r\n'
+    '\r\n'
+    'Budget Category,Budget Amount\r\n'
+    'Food,100.0\r\n'
+)
+
+def test_import():
+    """Test CSV and JSON uploads, per-row errors and re-import dedupe"""
+    print("📥 Testing Bulk Import")
+    print("=" * 40)
+    
+    storage = MemoryStorage()
+    
+    # Test 1: CSV in the export layout, stopping at the budget section
+    new, duplicates, errors, failed = plan_import(storage, 'u1', load_rows(io.BytesIO(CSV_UPLOAD.encode('utf-8')), 'csv'))
+    assert [(t['description'], t['amount']) for t in new] == [('Coffee', 3.5), ('Coffee', 3.5), ('Rent, January', 900.0)]
+    assert all(t['user_id'] == 'u1' and t['id'] for t in new)
+    assert duplicates == 0 and failed == 2
+    assert [e['row'] for e in errors] == [4, 6]
+    print("✅ CSV rows validated with per-row errors")
+    
+    # Test 2: Importing the same file again adds nothing
+    storage.add_transactions(new)
+    new, duplicates, _, _ = plan_import(storage, 'u1', load_rows(io.BytesIO(CSV_UPLOAD.encode('utf-8')), 'csv'))
+    assert new == [] and duplicates == 3
+    print("✅ Re-import is deduplicated against stored rows")
+    
+    # Test 3: JSON arrays
+    upload = json.dumps([{'date': '2024-01-01', 'description': 'Coffee', 'amount': 3.5, 'category': 'Food'},
+                         {'date': '2024-01-05', 'description': 'Bus', 'amount': '2', 'category': 'Transport'},
+                         {'date': '2024-01-06', 'description': 'Flag', 'amount': True, 'category': 'Food'},
+                         'not an object'])
+    new, duplicates, errors, failed = plan_import(storage, 'u1', load_rows(io.BytesIO(upload.encode()), 'json'))
+    assert [t['description'] for t in new] == ['Bus'] and duplicates == 1 and failed == 2
+    assert 'invalid amount True' in errors[0]['error']
+    print("✅ JSON array rows")
+    
+    # Test 4: Unusable uploads are rejected outright
+    oversized = b'Date,Description,Amount,Category\n2024-01-01,"' + b'x' * 200000 + b'",1,Food\n'
+    for upload, fmt in ((b'Foo,Bar\n1,2\n', 'csv'), (oversized, 'csv'), (b'{"date": "2024-01-01"}', 'json'), (b'[', 'json')):
+        try:
+            plan_import(storage, 'u1', load_rows(io.BytesIO(upload), fmt))
+            assert False, upload
+        except ValueError:
+            pass
+    print("✅ Bad headers, malformed CSV and non-array JSON rejected")
+    
+    print("\n🎉 Import tests passed!")
+
+if __name__ == "__main__":
+    test_import()
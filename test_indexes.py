@@ -0,0 +1,117 @@
+"""
+Test the in-memory indexes used by the JSON storage backend
+"""
+import os
+import sys
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+
+from indexes import UserIndex, UserPartitions, newest_first, transaction_date_key
+
+def test_user_index():
+    """Test id, email and reset token lookups stay current"""
+    print("🔎 Testing User Index")
+    print("=" * 40)
+    
+    alice = {'id': 'u1', 'email': 'alice@example.com', 'username': 'alice'}
+    bob = {'id': 'u2', 'email': 'bob@example.com', 'username': 'bob'}
+    index = UserIndex()
+    index.rebuild({'alice': alice, 'bob': bob})
+    
+    # Test 1: Lookups by id and email
+    assert index.by_id['u2'] is bob
+    assert index.by_email['alice@example.com'] is alice
+    print("✅ Id and email lookups")
+    
+    # Test 2: Reset token added and cleared on an in-place edit
+    alice['reset_token'] = 'token-1'
+    index.add(alice)
+    assert index.by_reset_token['token-1'] is alice
+    alice['reset_token'] = 'token-2'
+    index.add(alice)
+    assert 'token-1' not in index.by_reset_token
+    alice.pop('reset_token')
+    index.add(alice)
+    assert index.by_reset_token == {}
+    print("✅ Reset tokens follow in-place edits")
+    
+    # Test 3: Email change drops the old key
+    bob['email'] = 'robert@example.com'
+    index.add(bob)
+    assert 'bob@example.com' not in index.by_email
+    assert index.by_email['robert@example.com'] is bob
+    print("✅ Email changes are re-indexed")
+    
+    # Test 4: Expired tokens come off the heap once, skipping replaced ones
+    alice.update(reset_token='old', reset_expires='2024-01-01T10:00:00')
+    index.add(alice)
+    alice.update(reset_token='new', reset_expires='2024-01-01T12:00:00')
+    index.add(alice)
+    bob.update(reset_token='bob', reset_expires='2024-01-01T11:00:00')
+    index.add(bob)
+    assert index.pop_expired(datetime(2024, 1, 1, 9)) == []
+    assert index.pop_expired(datetime(2024, 1, 1, 11, 30)) == [bob]
+    bob['reset_expires'] = '2024-01-01T13:00:00'
+    index.add(bob)  # re-saving the popped token with a later expiry files it again
+    assert index.pop_expired(datetime(2024, 1, 1, 12)) == [alice]
+    assert index.pop_expired(datetime(2024, 1, 1, 12, 30)) == []
+    assert index.pop_expired(datetime(2024, 1, 1, 13)) == [bob]
+    print("✅ Expired reset tokens pop off the expiry heap")
+    
+    print("\n🎉 User index tests passed!")
+
+def test_user_partitions():
+    """Test per-user transaction lists stay in date order"""
+    print("🗂️ Testing User Partitions")
+    print("=" * 40)
+    
+    partitions = UserPartitions(sort_key=transaction_date_key)
+    partitions.rebuild([
+        {'id': 't1', 'user_id': 'u1', 'date': '2024-03-01'},
+        {'id': 't2', 'user_id': 'u2', 'date': '2024-01-01'},
+        {'id': 't3', 'user_id': 'u1', 'date': '2024-01-15'},
+    ])
+    assert [t['id'] for t in partitions.get('u1')] == ['t3', 't1']
+    assert [t['id'] for t in partitions.get('u2')] == ['t2']
+    assert partitions.get('nobody') == []
+    print("✅ Rebuild groups and sorts by date")
+    
+    partitions.add({'id': 't4', 'user_id': 'u1', 'date': '2024-02-01'})
+    partitions.add({'id': 't5', 'user_id': 'u1', 'date': '2024-03-01'})
+    assert [t['id'] for t in partitions.get('u1')] == ['t3', 't4', 't1', 't5']
+    print("✅ New records land in date order, after equal dates")
+    
+    print("\n🎉 User partition tests passed!")
+
+def test_newest_first():
+    """Test keyset walks over (date, id), with ties on date ordered by id"""
+    print("⏮️ Testing Newest-First Walk")
+    print("=" * 40)
+    
+    records = [
+        {'id': 'a', 'date': '2024-01-01'},
+        {'id': 'c', 'date': '2024-01-05'},
+        {'id': 'b', 'date': '2024-01-05'},
+        {'id': 'd', 'date': '2024-01-09'},
+    ]
+    ids = lambda *args, **kwargs: [r['id'] for r in newest_first(records, *args, **kwargs)]
+    
+    assert ids() == ['d', 'c', 'b', 'a']
+    assert ids(('2024-01-05', 'c')) == ['b', 'a']
+    assert ids(('2024-01-05', 'b')) == ['a']
+    assert ids(('2024-01-07', 'z')) == ['c', 'b', 'a']
+    print("✅ Cursor resumes right after (date, id)")
+    
+    assert ids(start='2024-01-05') == ['d', 'c', 'b']
+    assert ids(end='2024-01-05') == ['c', 'b', 'a']
+    assert ids(('2024-01-05', 'c'), start='2024-01-02') == ['b']
+    assert list(newest_first([])) == []
+    print("✅ Date range bounds")
+    
+    print("\n🎉 Newest-first tests passed!")
+
+if __name__ == "__main__":
+    test_user_index()
+    test_user_partitions()
+    test_newest_first()
@@ -0,0 +1,56 @@
+"""
+Test the append-only change journal
+"""
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+
+from journal import Journal
+
+def test_journal():
+    """Test append, replay, torn writes and compaction"""
+    print("📒 Testing Change Journal")
+    print("=" * 40)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'journal.log')
+        journal = Journal(path, compact_every=3)
+        
+        # Test 1: Appends are replayed in order
+        journal.append('add_transaction', {'id': '1', 'amount': 10.0})
+        journal.append('set_budget', {'user_id': 'u1', 'budgets': {'Food': 100.0}})
+        records = list(Journal(path).replay())
+        assert records == [
+            ('add_transaction', {'id': '1', 'amount': 10.0}),
+            ('set_budget', {'user_id': 'u1', 'budgets': {'Food': 100.0}})
+        ]
+        print("✅ Records replay in order")
+        
+        # Test 2: A torn final record is skipped
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('{"op":"add_tra')
+        replayed = Journal(path)
+        assert len(list(replayed.replay())) == 2
+        assert replayed.size == 2
+        print("✅ Torn write is ignored")
+        
+        # Test 3: The first append after a torn write replays too
+        replayed.append('add_transaction', {'id': '2', 'amount': 5.0})
+        records = list(Journal(path).replay())
+        assert len(records) == 3 and records[-1] == ('add_transaction', {'id': '2', 'amount': 5.0})
+        print("✅ Appends after a torn write are readable")
+        
+        # Test 4: Compaction threshold and truncate
+        journal.append('add_goal', {'id': 'g1'})
+        assert journal.needs_compaction()
+        journal.truncate()
+        assert not journal.needs_compaction()
+        assert list(Journal(path).replay()) == []
+        print("✅ Compaction threshold and truncate work")
+    
+    print("\n🎉 Journal tests passed!")
+
+if __name__ == "__main__":
+    test_journal()
@@ -0,0 +1,87 @@
+"""
+Test KDF password hashing and the transparent upgrade of legacy SHA-256 hashes
+"""
+import contextlib
+import hashlib
+import io
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+os.environ.setdefault('RATE_LIMIT_BACKEND', 'off')
+
+from passwords import PasswordHasher, is_legacy
+
+def test_password_hasher():
+    """Test both KDFs round-trip and only the current settings skip a rehash"""
+    print("🔐 Testing password hashing")
+    print("=" * 40)
+
+    for hasher in (PasswordHasher('pbkdf2_sha256', iterations=1000), PasswordHasher('scrypt', scrypt_n=2 ** 10)):
+        stored = hasher.hash('s3cret')
+        assert stored.startswith(hasher.algorithm + '$') and stored != hasher.hash('s3cret')
+        assert hasher.verify('s3cret', stored)
+        assert not hasher.verify('wrong', stored) and not hasher.verify('', stored)
+        assert not hasher.needs_rehash(stored)
+        hasher.close()
+    print("✅ pbkdf2_sha256 and scrypt hashes are salted and verify")
+
+    legacy = hashlib.sha256(b's3cret').hexdigest()
+    hasher = PasswordHasher(iterations=1000, workers=2)
+    assert is_legacy(legacy) and hasher.verify('s3cret', legacy) and not hasher.verify('wrong', legacy)
+    assert hasher.needs_rehash(legacy)
+    assert hasher.needs_rehash(PasswordHasher(iterations=2000).hash('s3cret'))
+    assert not hasher.verify('s3cret', None) and not hasher.verify('s3cret', 'pbkdf2_sha256$x$y$z')
+    hasher.close()
+    print("✅ Legacy and outdated hashes still verify but need a rehash")
+
+def test_login_upgrades_legacy_hash():
+    """Test a successful login replaces a stored SHA-256 hash with the current KDF"""
+    from api import app as budget_app
+
+    storage = budget_app.storage
+    storage.save_user({'id': 'legacy-user', 'email': 'legacy@example.com', 'username': 'legacy',
+                       'password': hashlib.sha256(b'old-password').hexdigest(), 'income': 0})
+    client = budget_app.app.test_client()
+
+    assert client.post('/login', data=dict(email='legacy@example.com', password='nope')).status_code == 200
+    assert is_legacy(storage.get_user_by_id('legacy-user')['password'])
+
+    assert client.post('/login', data=dict(email='legacy@example.com', password='old-password')).status_code == 302
+    stored = storage.get_user_by_id('legacy-user')['password']
+    assert not budget_app.passwords.needs_rehash(stored)
+    assert budget_app.passwords.verify('old-password', stored)
+    print("✅ Logging in upgrades a legacy hash")
+
+def test_login_hashes_once_quietly():
+    """Test every login attempt costs exactly one hash and prints nothing"""
+    from api import app as budget_app
+
+    client = budget_app.app.test_client()
+    client.post('/register', data=dict(username='once', email='once@example.com', password='pw', income='0'))
+    hasher = budget_app.passwords
+    hasher.reject('warm-up')  # builds the decoy hash once per process
+
+    hashes = []
+    submit = hasher._pool.submit
+    hasher._pool.submit = lambda fn, *args: (hashes.append(fn), submit(fn, *args))[1]
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output):
+            for email, password, status in [('once@example.com', 'pw', 302), ('once@example.com', 'bad', 200),
+                                            ('nobody@example.com', 'pw', 200)]:
+                hashes.clear()
+                assert client.post('/login', data=dict(email=email, password=password)).status_code == status
+                assert len(hashes) == 1, (email, password, hashes)
+    finally:
+        hasher._pool.submit = submit
+    assert output.getvalue() == ''
+    print("✅ Right, wrong and unknown logins each hash once and log nothing")
+
+    print("\n🎉 Password tests passed!")
+
+if __name__ == "__main__":
+    test_password_hasher()
+    test_login_upgrades_legacy_hash()
+    test_login_hashes_once_quietly()
@@ -0,0 +1,84 @@
+"""
+Test token-bucket rate limiting and the app's 429 responses
+"""
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+os.environ.setdefault('RATE_LIMIT_BACKEND', 'off')
+
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from ratelimit import MemoryBuckets, RateLimiter, SQLiteBuckets
+
+def test_token_buckets():
+    """Test both backends spend, refuse and refill tokens the same way"""
+    print("🚦 Testing rate limiting")
+    print("=" * 40)
+
+    path = os.path.join(tempfile.mkdtemp(), 'ratelimit.db')
+    for buckets in (MemoryBuckets(), SQLiteBuckets(path)):
+        assert buckets.take('ip:a', 4, 10, 2, now=100) == 0
+        assert buckets.take('ip:a', 6, 10, 2, now=100) == 0
+        assert buckets.take('ip:a', 3, 10, 2, now=100) == 1.5
+        # A refused request spends nothing
+        assert buckets.take('ip:a', 3, 10, 2, now=101.5) == 0
+        assert buckets.take('ip:b', 10, 10, 2, now=101.5) == 0
+        assert buckets.take('ip:a', 1, 10, 2, now=1000) == 0
+    print("✅ Memory and SQLite buckets spend, refuse and refill")
+
+    # A second worker on the same database shares the buckets
+    assert SQLiteBuckets(path).take('ip:b', 1, 10, 2, now=101.5) == 0.5
+    print("✅ SQLite buckets are shared between workers")
+
+    limiter = RateLimiter(MemoryBuckets(), capacity=5, refill=1)
+    assert limiter.check(['ip:a', 'user:1'], cost=50) == 0
+    assert limiter.check(['ip:b', 'user:1'], cost=1) == 1
+    assert limiter.check(['ip:b'], cost=1) == 0
+    print("✅ A request is charged to both its IP and its user")
+
+def test_app_rate_limit():
+    """Test logins cost more than page views and an empty bucket answers 429 with Retry-After"""
+    from api import app as budget_app
+
+    limiter = budget_app.limiter
+    budget_app.limiter = RateLimiter(MemoryBuckets(), capacity=25, refill=0.01)
+    try:
+        client = budget_app.app.test_client()
+        for _ in range(2):
+            assert client.post('/login', data=dict(email='nobody@example.com', password='pw')).status_code == 200
+        response = client.post('/login', data=dict(email='nobody@example.com', password='pw'))
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) >= 100 and response.get_json()['retry_after'] >= 100
+        print("✅ Repeated logins are refused with 429 and Retry-After")
+
+        assert client.get('/').status_code == 200
+        assert client.get('/health').status_code == 200
+        other = budget_app.app.test_client()
+        response = other.post('/login', data=dict(email='nobody@example.com', password='pw'),
+                              environ_base={'REMOTE_ADDR': '10.0.0.2'})
+        assert response.status_code == 200
+        print("✅ Page views, health checks and other clients still get through")
+        
+        # Behind one proxy, only the entry it appended identifies the client
+        budget_app.limiter = RateLimiter(MemoryBuckets(), capacity=25, refill=0.01)
+        wsgi_app = budget_app.app.wsgi_app
+        budget_app.app.wsgi_app = ProxyFix(wsgi_app, x_for=1)
+        try:
+            statuses = [client.post('/login', data=dict(email='nobody@example.com', password='pw'),
+                                    headers={'X-Forwarded-For': f'198.51.100.{i}, 203.0.113.9'}).status_code
+                        for i in range(4)]
+        finally:
+            budget_app.app.wsgi_app = wsgi_app
+        assert statuses == [200, 200, 429, 429]
+        print("✅ Spoofed X-Forwarded-For entries don't get a fresh bucket")
+    finally:
+        budget_app.limiter = limiter
+
+    print("\n🎉 Rate limit tests passed!")
+
+if __name__ == "__main__":
+    test_token_buckets()
+    test_app_rate_limit()
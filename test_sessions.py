@@ -0,0 +1,98 @@
+"""
+Test server-side sessions and the per-session user cache
+"""
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+
+from flask import Flask, session
+from sessions import ResolvedUsers, SQLiteSessionStore, ServerSessionInterface
+from storage import MemoryStorage
+
+def test_sqlite_sessions():
+    """Test the cookie holds only an id, the data outlives a worker and logins get a new id"""
+    print("🍪 Testing server-side sessions")
+    print("=" * 40)
+
+    path = os.path.join(tempfile.mkdtemp(), 'sessions.db')
+
+    def make_app():
+        app = Flask(__name__)
+        app.secret_key = 'test'
+        app.session_interface = ServerSessionInterface(SQLiteSessionStore(path))
+
+        @app.route('/visit')
+        def visit():
+            session['visits'] = session.get('visits', 0) + 1
+            return str(session['visits'])
+
+        @app.route('/login/<user_id>')
+        def login(user_id):
+            session['user_id'] = user_id
+            return 'ok'
+
+        @app.route('/logout')
+        def logout():
+            session.clear()
+            return 'bye'
+        return app
+
+    client = make_app().test_client()
+    assert client.get('/visit').get_data(as_text=True) == '1'
+    sid = client.get_cookie('session').value
+    assert 'visits' not in sid and len(sid) >= 40
+    print("✅ The cookie carries only a random id")
+
+    # A second worker sharing the database sees the same session
+    other = make_app().test_client()
+    other.set_cookie('session', sid)
+    assert other.get('/visit').get_data(as_text=True) == '2'
+    assert client.get('/visit').get_data(as_text=True) == '3'
+    print("✅ Session data is shared through SQLite")
+
+    client.get('/login/u1')
+    new_sid = client.get_cookie('session').value
+    assert new_sid != sid and SQLiteSessionStore(path).load(sid) is None
+    assert client.get('/visit').get_data(as_text=True) == '4'
+    print("✅ Logging in issues a new session id")
+
+    client.get('/logout')
+    assert client.get_cookie('session') is None and SQLiteSessionStore(path).load(new_sid) is None
+    print("✅ Logging out deletes the stored session")
+
+def test_resolved_users():
+    """Test a fresh cached user is served without asking storage anything"""
+    storage = MemoryStorage()
+    storage.save_user({'id': 'u1', 'email': 'u1@example.com', 'username': 'one', 'income': 100})
+    users = ResolvedUsers(storage, max_sessions=2, ttl=60)
+
+    reads = []
+    get_user_by_id = storage.get_user_by_id
+    storage.get_user_by_id = lambda user_id: (reads.append('user'), get_user_by_id(user_id))[1]
+    storage.get_data_version = lambda user_id: reads.append('version')
+    assert users.get('s1', 'u1')['income'] == 100
+    storage.save_user(dict(get_user_by_id('u1'), income=200))
+    assert users.get('s1', 'u1')['income'] == 100
+    assert reads == ['user']
+    print("✅ Cache hits don't touch storage")
+
+    users.ttl = 0
+    assert users.get('s1', 'u1')['income'] == 200 and reads == ['user', 'user']
+    users.ttl = 60
+    print("✅ The session's user is re-read once the entry expires")
+
+    users.get('s2', 'u1')
+    users.get('s3', 'u1')
+    assert 's1' not in users._entries and len(users._entries) == 2
+    users.discard('s3')
+    assert list(users._entries) == ['s2']
+    print("✅ The cache keeps the most recent sessions")
+
+    print("\n🎉 Session tests passed!")
+
+if __name__ == "__main__":
+    test_sqlite_sessions()
+    test_resolved_users()
@@ -0,0 +1,71 @@
+"""
+Test the binary snapshot format and how JSONStorage picks it up
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+
+from snapshot import read_snapshot, write_snapshot
+from storage import JSONStorage
+
+USERS = {'alice': {'id': 'u1', 'email': 'a@example.com', 'username': 'alice', 'password': 'x', 'income': 100.0}}
+TRANSACTIONS = [
+    {'id': f't{n}', 'user_id': 'u1', 'description': f'Café "{n}"\nsecond line',
+     'amount': n * 1.25, 'category': 'Food', 'date': f'2024-01-0{n + 1}'}
+    for n in range(5)
+]
+
+def test_snapshot_roundtrip():
+    """Test columnar and fallback layouts read back exactly"""
+    print("💾 Testing Binary Snapshot")
+    print("=" * 40)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'snapshot.bin')
+        
+        write_snapshot(path, USERS, TRANSACTIONS, {'u1': {'Food': 50.0}}, [{'id': 'g1', 'user_id': 'u1'}])
+        assert read_snapshot(path) == (USERS, TRANSACTIONS, {'u1': {'Food': 50.0}}, [{'id': 'g1', 'user_id': 'u1'}])
+        print("✅ Columnar layout round-trips")
+        
+        odd = TRANSACTIONS + [{'id': 'x', 'user_id': 'u1', 'amount': 1.0, 'category': 'Food', 'date': '2024-02-01', 'description': 'x', 'note': 'extra field'}]
+        write_snapshot(path, USERS, odd, {}, [])
+        assert read_snapshot(path)[1] == odd
+        print("✅ Rows with extra fields fall back to JSON")
+        
+        write_snapshot(path, {}, [], {}, [])
+        assert read_snapshot(path) == ({}, [], {}, [])
+        print("✅ Empty data round-trips")
+
+def test_storage_prefers_current_snapshot():
+    """Test compaction writes snapshot.bin and later JSON writes supersede it"""
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = JSONStorage(tmp, mode='journal', compact_every=3, snapshot_format='binary')
+        storage.load_data()
+        storage.save_user(dict(USERS['alice']))
+        for transaction in TRANSACTIONS:
+            storage.add_transaction(dict(transaction))
+        assert os.path.exists(storage.snapshot_file)
+        assert not os.path.exists(storage.transactions_file)
+        
+        reloaded = JSONStorage(tmp, mode='journal')
+        reloaded.load_data()
+        assert len(reloaded.get_user_transactions('u1')) == 5
+        print("✅ Journal compaction writes snapshot.bin and load_data reads it")
+        
+        # Switching back to JSON files rewrites all of them on the first change
+        time.sleep(0.01)
+        reloaded.mode = 'files'
+        reloaded.set_user_budgets('u1', {'Food': 75.0})
+        from_json = JSONStorage(tmp)
+        from_json.load_data()
+        assert not from_json.stale_files
+        assert from_json.get_user_by_id('u1')['username'] == 'alice'
+        assert len(from_json.get_user_transactions('u1')) == 5
+        print("✅ Newer JSON files take precedence over an old snapshot")
+
+if __name__ == "__main__":
+    test_snapshot_roundtrip()
+    test_storage_prefers_current_snapshot()
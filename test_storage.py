@@ -0,0 +1,291 @@
+"""
+Test the JSON and SQLite storage backends
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+
+from storage import JSONStorage, MemoryStorage, SQLiteStorage
+
+def exercise_backend(storage, reopen):
+    """Run the same operations against a backend and check what a fresh instance sees"""
+    user = {'id': 'u1', 'email': 'a@example.com', 'username': 'alice', 'password': 'x', 'income': 1000.0}
+    version = storage.get_data_version('u1')
+    storage.save_user(user)
+    assert storage.get_data_version('u1') != version
+    storage.add_transaction({'id': 't1', 'user_id': 'u1', 'description': 'Lunch', 'amount': 12.5, 'category': 'Food', 'date': '2024-01-02'})
+    storage.add_transaction({'id': 't2', 'user_id': 'u2', 'description': 'Bus', 'amount': 3.0, 'category': 'Transport', 'date': '2024-01-03'})
+    storage.add_transaction({'id': 't3', 'user_id': 'u1', 'description': 'Dinner', 'amount': 30.0, 'category': 'Food', 'date': '2024-01-09'})
+    storage.set_user_budgets('u1', {'Food': 200.0})
+    storage.add_goal({'id': 'g1', 'user_id': 'u1', 'title': 'Trip', 'target_amount': 500.0, 'current_amount': 0, 'deadline': '2024-12-31', 'category': 'Travel'})
+    assert storage.update_goal_progress('u2', 'g1', 50.0) is None
+    version = storage.get_data_version('u1')
+    storage.update_goal_progress('u1', 'g1', 100.0)
+    assert storage.get_data_version('u1') != version
+    
+    user['reset_token'] = 'tok'
+    storage.save_user(user)
+    
+    fresh = reopen()
+    assert fresh.get_user_by_email('a@example.com')['username'] == 'alice'
+    assert fresh.get_user_by_id('u1')['email'] == 'a@example.com'
+    assert fresh.get_user_by_reset_token('tok')['id'] == 'u1'
+    assert fresh.get_user_by_username('nobody') is None
+    assert [t['id'] for t in fresh.get_user_transactions('u1')] == ['t1', 't3']
+    assert [t['id'] for t in fresh.get_user_transactions_between('u1', '2024-01-02', '2024-01-08')] == ['t1']
+    assert [t['id'] for t in fresh.get_user_transactions_between('u1', '2024-01-03', '2024-01-09')] == ['t3']
+    assert [t['id'] for t in fresh.get_user_transactions_between('u1', end='2024-01-09')] == ['t1', 't3']
+    assert list(fresh.get_user_transactions_between('nobody', '2024-01-01')) == []
+    assert [t['id'] for t in fresh.iter_user_transactions('u1')] == ['t1', 't3']
+    assert [t['id'] for t in fresh.iter_user_transactions('u1', start='2024-01-03', category='Food')] == ['t3']
+    assert list(fresh.iter_user_transactions('u1', end='2024-01-08', category='Transport')) == []
+    page, cursor = fresh.get_transactions_page('u1', 1)
+    assert [t['id'] for t in page] == ['t3'] and cursor == ('2024-01-09', 't3')
+    page, cursor = fresh.get_transactions_page('u1', 1, cursor)
+    assert [t['id'] for t in page] == ['t1'] and cursor is None
+    assert fresh.get_transactions_page('u1', 5, category='Transport') == ([], None)
+    assert [t['id'] for t in fresh.get_transactions_page('u1', 5, start='2024-01-03')[0]] == ['t3']
+    assert fresh.get_user_budgets('u1') == {'Food': 200.0}
+    assert fresh.get_user_goals('u1')[0]['current_amount'] == 100.0
+    assert fresh.stats()['transactions'] == 3
+    
+    summary = fresh.get_spending_summary('u1')
+    assert (summary.total, summary.count) == (42.5, 2)
+    assert summary.by_category == {'Food': 42.5}
+    assert summary.by_day == {'2024-01-02': 12.5, '2024-01-09': 30.0}
+    assert summary.by_month == {'2024-01': 42.5}
+    assert fresh.get_spending_summary('nobody').count == 0
+    
+    user = dict(fresh.get_user_by_id('u1'), reset_token='tok', reset_expires='2024-01-01T12:00:00')
+    fresh.save_user(user)
+    assert fresh.purge_expired_reset_tokens(datetime(2024, 1, 1, 11)) == 0
+    assert fresh.purge_expired_reset_tokens(datetime(2024, 1, 1, 13)) == 1
+    assert fresh.get_user_by_reset_token('tok') is None
+    assert reopen().get_user_by_id('u1').get('reset_token') is None
+
+def test_storage():
+    """Test both backends behave the same"""
+    print("🗄️ Testing Storage Backends")
+    print("=" * 40)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        def reopen_json():
+            storage = JSONStorage(tmp)
+            storage.load_data()
+            return storage
+        exercise_backend(reopen_json(), reopen_json)
+        print("✅ JSON file backend")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        def reopen_journal():
+            storage = JSONStorage(tmp, mode='journal', compact_every=4)
+            storage.load_data()
+            return storage
+        exercise_backend(reopen_journal(), reopen_journal)
+        print("✅ JSON file backend in journal mode")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        def reopen_columnar():
+            storage = JSONStorage(tmp, transaction_store='columnar')
+            storage.load_data()
+            return storage
+        exercise_backend(reopen_columnar(), reopen_columnar)
+        print("✅ JSON file backend with the columnar transaction store")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'budget.db')
+        exercise_backend(SQLiteStorage(path), lambda: SQLiteStorage(path))
+        print("✅ SQLite backend")
+    
+    memory = MemoryStorage()
+    exercise_backend(memory, lambda: memory)
+    print("✅ In-memory backend")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = JSONStorage(tmp, write_behind=0.05)
+        storage.load_data()
+        def reopen_after_flush():
+            storage.close()
+            fresh = JSONStorage(tmp)
+            fresh.load_data()
+            return fresh
+        exercise_backend(storage, reopen_after_flush)
+        print("✅ JSON file backend with write-behind")
+    
+    print("\n🎉 Storage tests passed!")
+
+def test_write_behind_group_commit():
+    """Test a burst of changes is written with one commit and flushed on close"""
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = JSONStorage(tmp, mode='journal', write_behind=0.2)
+        storage.load_data()
+        commits = []
+        append_many = storage.journal.append_many
+        storage.journal.append_many = lambda records: (commits.append(len(records)), append_many(records))
+        
+        for i in range(20):
+            storage.add_transaction({'id': str(i), 'user_id': 'u1', 'amount': 1.0, 'category': 'Food', 'date': '2024-01-01'})
+        assert not os.path.exists(storage.journal.path)
+        storage.close()
+        
+        assert commits == [20]
+        fresh = JSONStorage(tmp, mode='journal')
+        fresh.load_data()
+        assert fresh.get_spending_summary('u1').count == 20
+        print("✅ Burst of 20 changes written as one journal commit")
+
+def test_write_behind_retries_failed_flush():
+    """Test a failed flush keeps its changes queued and writes without holding the lock"""
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = JSONStorage(tmp, write_behind=60)
+        storage.load_data()
+        write_file = storage._write_file
+        def fail(path, text):
+            raise OSError('disk full')
+        storage._write_file = fail
+        
+        storage.add_transaction({'id': 't1', 'user_id': 'u1', 'amount': 1.0, 'category': 'Food', 'date': '2024-01-01'})
+        try:
+            storage.flush()
+            assert False, "flush should raise"
+        except OSError:
+            pass
+        assert storage.dirty == {'transactions'}
+        print("✅ A failed flush keeps its changes queued")
+        
+        lock_free = []
+        def write_unlocked(path, text):
+            # Another thread can take the lock while the file is written
+            probe = threading.Thread(target=lambda: lock_free.append(storage.lock.acquire(timeout=1) and storage.lock.release() is None))
+            probe.start()
+            probe.join()
+            write_file(path, text)
+        storage._write_file = write_unlocked
+        storage.close()
+        assert lock_free == [True]
+        
+        fresh = JSONStorage(tmp)
+        fresh.load_data()
+        assert fresh.get_spending_summary('u1').count == 1
+        print("✅ The retry is written on close, outside the data lock")
+
+def test_write_behind_recovers_without_new_changes():
+    """Test the background flusher retries a failed write on its own"""
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = JSONStorage(tmp, write_behind=0.05)
+        storage.load_data()
+        write_file = storage._write_file
+        failures = []
+        def fail_once(path, text):
+            if not failures:
+                failures.append(path)
+                raise OSError('transient')
+            write_file(path, text)
+        storage._write_file = fail_once
+        
+        storage.add_transaction({'id': 't1', 'user_id': 'u1', 'amount': 1.0, 'category': 'Food', 'date': '2024-01-01'})
+        path = os.path.join(tmp, 'transactions.json')
+        deadline = time.time() + 5
+        while not os.path.exists(path) and time.time() < deadline:
+            time.sleep(0.02)
+        assert failures and os.path.exists(path) and not storage.dirty
+        storage.close()
+        print("✅ A failed background flush is retried without another change")
+
+def test_failed_compaction_keeps_journal():
+    """Test a snapshot that can't be written leaves the journal in place"""
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = JSONStorage(tmp, mode='journal', compact_every=3)
+        storage.load_data()
+        def fail(path, data):
+            raise OSError('disk full')
+        storage._write_file = fail
+        
+        for i in range(5):
+            storage.add_transaction({'id': str(i), 'user_id': 'u1', 'amount': 1.0, 'category': 'Food', 'date': '2024-01-01'})
+        assert os.path.getsize(storage.journal.path) > 0
+        
+        fresh = JSONStorage(tmp, mode='journal')
+        fresh.load_data()
+        assert fresh.get_spending_summary('u1').count == 5
+        print("✅ A failed compaction keeps every journaled change")
+
+def test_import_rejects_duplicate_emails():
+    """Test migrating users who share an email imports nothing instead of dropping one"""
+    users = {'a': {'id': 'u1', 'email': 'same@example.com', 'username': 'a', 'password': 'x'},
+             'b': {'id': 'u2', 'email': 'same@example.com', 'username': 'b', 'password': 'x'}}
+    transactions = [{'id': 't1', 'user_id': 'u1', 'description': 'x', 'amount': 1.0, 'category': 'Food', 'date': '2024-01-01'}]
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SQLiteStorage(os.path.join(tmp, 'budget.db'))
+        try:
+            storage.import_data(users, transactions, {}, [])
+            assert False, "import should refuse duplicate emails"
+        except ValueError as e:
+            assert 'same@example.com' in str(e)
+        assert storage.is_empty() and storage.stats()['transactions'] == 0
+        
+        users['b']['email'] = 'b@example.com'
+        storage.import_data(users, transactions, {}, [])
+        assert len(storage.list_user_ids()) == 2
+    print("✅ Duplicate emails abort the migration with nothing imported")
+
+def test_only_changed_files_written():
+    """Test each change rewrites only its own file, atomically"""
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = JSONStorage(tmp)
+        storage.load_data()
+        written = []
+        write_file = storage._write_file
+        storage._write_file = lambda path, data: (written.append(os.path.basename(path)), write_file(path, data))
+        
+        storage.add_transaction({'id': 't1', 'user_id': 'u1', 'amount': 1.0, 'category': 'Food', 'date': '2024-01-01'})
+        storage.set_user_budgets('u1', {'Food': 50.0})
+        assert written == ['transactions.json', 'budgets.json']
+        assert sorted(os.listdir(tmp)) == ['budgets.json', 'transactions.json']
+        print("✅ Only the changed files are rewritten, with no temp files left behind")
+
+def test_bulk_add_single_write():
+    """Test add_transactions persists a whole batch with one write on every backend"""
+    batch = [{'id': f't{i}', 'user_id': 'u1', 'description': 'x', 'amount': 1.0, 'category': 'Food', 'date': '2024-01-01'}
+             for i in range(50)]
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = JSONStorage(tmp)
+        storage.load_data()
+        written = []
+        write_file = storage._write_file
+        storage._write_file = lambda path, data: (written.append(os.path.basename(path)), write_file(path, data))
+        storage.add_transactions(batch)
+        assert written == ['transactions.json']
+        
+        journaled = JSONStorage(tmp, mode='journal')
+        journaled.load_data()
+        commits = []
+        append_many = journaled.journal.append_many
+        journaled.journal.append_many = lambda records: (commits.append(len(records)), append_many(records))
+        journaled.add_transactions([dict(t, id=f'j{i}') for i, t in enumerate(batch)])
+        assert commits == [50]
+        
+        path = os.path.join(tmp, 'budget.db')
+        sqlite = SQLiteStorage(path)
+        sqlite.add_transactions(batch)
+        assert SQLiteStorage(path).get_spending_summary('u1').count == 50
+        
+        for backend in (storage, journaled, sqlite):
+            assert backend.get_data_version('u1') != backend.get_data_version('nobody')
+    print("✅ A batch of 50 transactions is one file write, journal commit or SQL transaction")
+
+if __name__ == "__main__":
+    test_storage()
+    test_write_behind_group_commit()
+    test_write_behind_retries_failed_flush()
+    test_write_behind_recovers_without_new_changes()
+    test_failed_compaction_keeps_journal()
+    test_import_rejects_duplicate_emails()
+    test_only_changed_files_written()
+    test_bulk_add_single_write()
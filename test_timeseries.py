@@ -0,0 +1,58 @@
+"""
+Test the chart series and bucketed range queries built from precomputed spending totals
+"""
+import os
+import sys
+from datetime import date
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+
+from aggregates import SpendingSummary
+from timeseries import GRANULARITIES, bucket_count, buckets, chart_series, last_months, spending_buckets
+
+def test_chart_series():
+    """Test category and monthly trend series"""
+    print("📈 Testing chart series")
+    print("=" * 40)
+    
+    assert last_months(3, date(2024, 2, 15)) == [(2023, 12), (2024, 1), (2024, 2)]
+    print("✅ Trend months run back across the year boundary")
+    
+    summary = SpendingSummary.from_transactions([
+        {'amount': 10.0, 'category': 'Food', 'date': '2023-12-31'},
+        {'amount': 25.0, 'category': 'Rent', 'date': '2024-02-01'},
+        {'amount': 5.5, 'category': 'Food', 'date': '2024-02-14T09:30:00'},
+        {'amount': 99.0, 'category': 'Food', 'date': '2023-06-01'},
+    ])
+    assert summary.by_month == {'2023-12': 10.0, '2024-02': 30.5, '2023-06': 99.0}
+    print("✅ Monthly buckets are kept as transactions are added")
+    
+    series = chart_series(summary, 1000.0, months=3, today=date(2024, 2, 15))
+    assert series == {
+        'category_labels': ['Food', 'Rent'],
+        'category_data': [114.5, 25.0],
+        'trend_labels': ['Dec 2023', 'Jan 2024', 'Feb 2024'],
+        'income_trend': [1000.0, 1000.0, 1000.0],
+        'expense_trend': [10.0, 0, 30.5]
+    }
+    assert chart_series(SpendingSummary(), None, months=2, today=date(2024, 2, 15))['expense_trend'] == [0, 0]
+    print("✅ Series come straight from the buckets, empty months as zero")
+    
+    assert list(buckets(date(2024, 1, 3), date(2024, 1, 16), 'week')) == [
+        (date(2024, 1, 3), date(2024, 1, 7)), (date(2024, 1, 8), date(2024, 1, 14)), (date(2024, 1, 15), date(2024, 1, 16))]
+    for granularity in GRANULARITIES:
+        for start, end in [(date(2023, 12, 30), date(2024, 3, 2)), (date(2024, 2, 29), date(2024, 2, 29))]:
+            assert bucket_count(start, end, granularity) == len(list(buckets(start, end, granularity)))
+    print("✅ Day, week and month buckets are clipped to the range")
+    
+    assert spending_buckets(summary, date(2023, 12, 1), date(2024, 2, 14), 'month') == [
+        {'start': '2023-12-01', 'end': '2023-12-31', 'amount': 10.0},
+        {'start': '2024-01-01', 'end': '2024-01-31', 'amount': 0},
+        {'start': '2024-02-01', 'end': '2024-02-14', 'amount': 30.5}]
+    assert [b['amount'] for b in spending_buckets(summary, date(2024, 2, 1), date(2024, 2, 14), 'week', 'Food')] == [0, 0, 5.5]
+    print("✅ Bucketed spending, overall and per category")
+    
+    print("\n🎉 Chart series tests passed!")
+
+if __name__ == "__main__":
+    test_chart_series()